@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Synchronize the timelogs of a whole team in a single run
+
+Each `<name>.gtimelogrc` of the configuration directory is synchronized,
+non interactively, with the credentials of `<name>.env` (JIRA_API_TOKEN,
+TEMPO_API_TOKEN and ODOO_PASSWORD lines) from the credentials directory.
+"""
+import argparse
+import io
+import pathlib
+import sys
+import threading
+import time
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from exporter import (
+    Utils, add_sync_arguments, check_not_before, sync,
+)
+
+BatchResult = namedtuple('BatchResult', 'name status exit_status seconds output')
+
+
+class ThreadOutput(io.TextIOBase):
+    """Stand-in for `sys.stdout` keeping the output of each sync apart
+
+    The output of a thread goes to the buffer it captures to, or else to
+    the one of the thread which started it: syncs run their own threads.
+    Output of other threads goes to the original stream.
+
+    Used as a context manager, which replaces `sys.stdout` and makes
+    threads inherit the buffer of their parent, until it exits.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._thread_start = None
+
+    def __enter__(self):
+        thread_start = self._thread_start = threading.Thread.start
+
+        def start(thread):
+            thread.output_buffer = self._buffer()
+            thread_start(thread)
+
+        threading.Thread.start = start
+        sys.stdout = self
+        return self
+
+    def __exit__(self, *exc_info):
+        sys.stdout = self.stream
+        threading.Thread.start = self._thread_start
+
+    @staticmethod
+    def _buffer():
+        return getattr(threading.current_thread(), 'output_buffer', None)
+
+    def capture(self, buffer):
+        threading.current_thread().output_buffer = buffer
+
+    def write(self, text):
+        return (self._buffer() or self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def load_credentials(path):
+    """Read `KEY=value` lines, as an environment file"""
+    credentials = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            key, _sep, value = line.partition('=')
+            credentials[key.strip()] = value.strip().strip('"\'')
+    return credentials
+
+
+def user_config(config_file, credentials_dir, args):
+    user_args = argparse.Namespace(**vars(args))
+    user_args.config = str(config_file)
+    config = Utils.parse_config(user_args)
+    if not config.get('timelog_file'):
+        raise Exception(
+            "timelog_file is mandatory in %s for batch runs." % config_file)
+
+    credentials_file = credentials_dir / (config_file.stem + '.env')
+    credentials = {}
+    if credentials_file.exists():
+        credentials = load_credentials(credentials_file)
+    keys = {
+        'jira_api_token': 'JIRA_API_TOKEN',
+        'tempo_api_token': 'TEMPO_API_TOKEN',
+    }
+    if not (args.no_attendance or config.get('no_attendance')):
+        keys['odoo_password'] = 'ODOO_PASSWORD'
+    for key, name in keys.items():
+        # values of the gtimelogrc take precedence
+        config.setdefault(key, credentials.get(name))
+        if not config[key]:
+            raise Exception('%s missing in %s.' % (name, credentials_file))
+    check_not_before(config)
+    return config, user_args
+
+
+def run_user(name, config_file, args, output, http_adapter):
+    buffer = io.StringIO()
+    output.capture(buffer)
+    start = time.perf_counter()
+    try:
+        config, user_args = user_config(config_file, args.credentials, args)
+        config['http_adapter'] = http_adapter
+        exit_status = sync(config, user_args)
+        status = 'ok' if exit_status == 0 else 'failed'
+    except Exception as e:
+        print(e)
+        exit_status = 1
+        status = 'error'
+    finally:
+        output.capture(None)
+    return BatchResult(name, status, exit_status,
+                       time.perf_counter() - start, buffer.getvalue())
+
+
+def report(results):
+    print()
+    print("Batch report")
+    print("============")
+    for result in sorted(results, key=lambda result: result.name):
+        last_line = ''
+        if result.status != 'ok':
+            lines = result.output.strip().splitlines()
+            last_line = lines[-1] if lines else ''
+        print("  {:<24} {:<7} {:>7.1f}s  {}".format(
+            result.name, result.status, result.seconds, last_line))
+    failed = [result for result in results if result.exit_status]
+    print()
+    print("{} synchronized, {} failed".format(
+        len(results) - len(failed), len(failed)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory', type=pathlib.Path,
+                        help='Directory of <name>.gtimelogrc files')
+    parser.add_argument('--credentials', type=pathlib.Path,
+                        help='Directory of <name>.env files '
+                             '(default: the configuration directory)')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Number of users synchronized at the same time')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='Only print the batch report')
+    add_sync_arguments(parser)
+    # a batch never asks anything
+    parser.set_defaults(no_interactive=True, submit=False,
+                        select_reviewer=False, plan_out=None)
+    args = parser.parse_args()
+    args.credentials = args.credentials or args.directory
+
+    config_files = sorted(args.directory.glob('*.gtimelogrc'))
+    if not config_files:
+        raise Exception("No .gtimelogrc file in %s." % args.directory)
+
+    from wrappers.transport import new_adapter
+
+    # All users share the connections to each host
+    http_adapter = new_adapter(pool_maxsize=max(10, args.workers * 5))
+    results = []
+    with ThreadOutput(sys.stdout) as output, \
+            ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(run_user, config_file.stem, config_file, args,
+                        output, http_adapter)
+            for config_file in config_files
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if not args.quiet:
+                title = "{} ({})".format(result.name, result.status)
+                print()
+                print(title)
+                print("#" * len(title))
+                print(result.output, end='')
+    report(results)
+    return 1 if any(result.exit_status for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
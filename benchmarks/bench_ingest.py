@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Benchmark the decoding of Tempo worklogs
+
+Compare `JiraClient.worklog_from_tempo` and `MultiLog` comparisons with
+the former dateutil decoding and dict based `MultiLog.__eq__`, on pages of
+synthetic Tempo worklogs. Times are the best of `--runs`, with the
+throughput in worklogs per second, and the memory is the peak traced by
+tracemalloc during a separate run.
+
+    python benchmarks/bench_ingest.py [--sizes 10000 100000]
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+from datetime import date, timedelta
+from os.path import dirname, realpath
+
+sys.path.insert(0, dirname(dirname(realpath(__file__))))
+
+from wrappers.jira_client import JiraClient  # noqa: E402
+
+
+class LegacyMultiLog(object):
+    """`MultiLog` as it was compared before"""
+
+    __slots__ = (
+        "id", "issue", "duration", "date", "comment", "worklog_id"
+    )
+
+    def __init__(self, _id, issue, duration, date, comment, worklog_id=None):
+        self.id = int(_id) if _id else None
+        self.issue = issue
+        self.duration = duration
+        self.date = date
+        self.comment = comment
+        self.worklog_id = worklog_id
+
+    def _asdict(self):
+        return {k: getattr(self, k) for k in ("issue", "duration", "date", "comment")}
+
+    def __eq__(self, other):
+        return self._asdict() == other._asdict()
+
+
+def legacy_worklog_from_tempo(entry):
+    from dateutil import parser
+
+    return LegacyMultiLog(
+        entry['issue']['id'],
+        None,
+        entry['timeSpentSeconds'],
+        parser.parse(entry['startDate']).date(),
+        entry['description'],
+        worklog_id=entry['tempoWorklogId'],
+    )
+
+
+def tempo_entries(size, seed=42):
+    """Worklogs as returned by Tempo, spread over a year"""
+    rand = random.Random(seed)
+    start = date(2023, 1, 2)
+    return [{
+        'tempoWorklogId': 1000 + i,
+        'issue': {'id': 10000 + rand.randint(1, 50)},
+        'timeSpentSeconds': rand.choice((900, 1800, 3600, 5400)),
+        'startDate': (start + timedelta(days=i * 365 // size)).isoformat(),
+        'startTime': '08:00:00',
+        'description': rand.choice(('Daily', 'Review', 'Development')),
+        'updatedAt': '2023-12-31T12:00:00Z',
+    } for i in range(size)]
+
+
+def ingest(decode, entries):
+    return [decode(entry) for entry in entries]
+
+
+def compare(pairs):
+    return sum(log == other for log, other in pairs)
+
+
+def pairs(logs, copies):
+    """Each log with a copy of itself, as when reconciling"""
+    return list(zip(logs, copies))
+
+
+def measure(runs, func, *args):
+    """Return the best time of `runs` and the peak memory of `func`"""
+    elapsed = min(
+        measure_time(func, *args) for _i in range(runs)
+    )
+    tracemalloc.start()
+    func(*args)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def measure_time(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', type=int,
+                        default=[10000, 30000, 100000])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    print('{:>8} {:<8} {:>10} {:>10} {:>12} {:>12} {:>10} {:>10}'.format(
+        'worklogs', 'step', 'legacy', 'current', 'legacy/s', 'current/s',
+        'legacy', 'current'))
+    for size in args.sizes:
+        entries = tempo_entries(size)
+        legacy_pairs = pairs(ingest(legacy_worklog_from_tempo, entries),
+                             ingest(legacy_worklog_from_tempo, entries))
+        current_pairs = pairs(ingest(JiraClient.worklog_from_tempo, entries),
+                              ingest(JiraClient.worklog_from_tempo, entries))
+        steps = (
+            ('ingest', (ingest, legacy_worklog_from_tempo, entries),
+             (ingest, JiraClient.worklog_from_tempo, entries)),
+            ('compare', (compare, legacy_pairs), (compare, current_pairs)),
+        )
+        for step, legacy_call, current_call in steps:
+            legacy_time, legacy_peak = measure(args.runs, *legacy_call)
+            current_time, current_peak = measure(args.runs, *current_call)
+            print('{:>8} {:<8} {:>9.3f}s {:>9.3f}s {:>12.0f} {:>12.0f} '
+                  '{:>7.0f}KiB {:>7.0f}KiB'.format(
+                      size, step, legacy_time, current_time,
+                      size / legacy_time, size / current_time,
+                      legacy_peak / 1024, current_peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Benchmark the Tempo / gtimelog reconciliation
+
+Compare `wrappers.reconcile.reconcile` with the former pairwise
+`log not in logs` diff on synthetic windows from a week to a year.
+
+    python benchmarks/bench_reconcile.py [--sizes 200 2000 20000]
+"""
+import argparse
+import random
+import sys
+import time
+
+from datetime import date, timedelta
+from os.path import dirname, realpath
+
+sys.path.insert(0, dirname(dirname(realpath(__file__))))
+
+from wrappers.multi_log import MultiLog  # noqa: E402
+from wrappers.reconcile import reconcile  # noqa: E402
+
+# the pairwise diff is quadratic, do not wait for it on huge windows
+LEGACY_MAX_SIZE = 1000
+
+
+def generate_logs(size, seed=42):
+    rand = random.Random(seed)
+    start = date(2023, 1, 2)
+    logs = []
+    for i in range(size):
+        logs.append(MultiLog(
+            None,
+            'PROJ-%d' % rand.randint(1, 50),
+            rand.choice((900, 1800, 3600, 5400)),
+            start + timedelta(days=i * 365 // max(size, 1)),
+            rand.choice(('Daily', 'Review', 'Development', 'Support')),
+        ))
+    return logs
+
+
+def mutate(logs, ratio, seed=7):
+    """Copy `logs`, changing the duration of `ratio` of them"""
+    rand = random.Random(seed)
+    copies = []
+    for log in logs:
+        duration = log.duration
+        if rand.random() < ratio:
+            duration += 900
+        copies.append(
+            MultiLog(None, log.issue, duration, log.date, log.comment))
+    return copies
+
+
+def legacy_diff(remote_logs, local_logs):
+    to_delete = [log for log in remote_logs if log not in local_logs]
+    to_create = [log for log in local_logs if log not in remote_logs]
+    return to_create, to_delete
+
+
+def timeit(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', type=int,
+                        default=[60, 250, 1000, 5000, 20000])
+    parser.add_argument('--changed', type=float, default=0.1,
+                        help='ratio of logs changed between both sides')
+    args = parser.parse_args()
+
+    print('{:>8} {:>12} {:>12} {:>8} {:>8}'.format(
+        'logs', 'reconcile', 'pairwise', 'create', 'delete'))
+    for size in args.sizes:
+        local_logs = generate_logs(size)
+        remote_logs = mutate(local_logs, args.changed)
+        elapsed, result = timeit(reconcile, remote_logs, local_logs)
+        legacy = '-'
+        if size <= LEGACY_MAX_SIZE:
+            legacy = '%.4fs' % timeit(legacy_diff, remote_logs, local_logs)[0]
+        print('{:>8} {:>11.4f}s {:>12} {:>8} {:>8}'.format(
+            size, elapsed, legacy,
+            len(result.to_create), len(result.to_delete)))
+
+
+if __name__ == '__main__':
+    main()
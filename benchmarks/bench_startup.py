@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Benchmark the start up of exporter.py
+
+Each target runs exporter.py in a new interpreter with `-X importtime` and
+reports its wall time, the time spent importing modules and the slowest
+top level imports:
+
+* `help`: `exporter.py --help`
+* `noop`: a sync of one week against the mock servers, already in sync
+* `noop-no-attendance`: the same with `--no-attendance`
+
+    python benchmarks/bench_startup.py [--targets help noop] [--runs 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from datetime import datetime, timedelta
+from os.path import dirname, join, realpath
+
+ROOT = dirname(dirname(realpath(__file__)))
+sys.path.insert(0, ROOT)
+
+import synthetic  # noqa: E402
+from mock_server import MockServer, MockState  # noqa: E402
+
+TARGETS = ('help', 'noop', 'noop-no-attendance')
+# a monday
+WEEK_START = datetime(2023, 12, 18)
+
+
+def parse_importtime(stderr):
+    """Return the total import time and the top level imports, in seconds"""
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _self, cumulative, name = line[len('import time:'):].split('|')
+        # nested imports are indented
+        if not name.startswith('  '):
+            top_level.append((name.strip(), int(cumulative) / 1e6))
+    return sum(seconds for _name, seconds in top_level), top_level
+
+
+def run(args, env):
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', join(ROOT, 'exporter.py')]
+        + args,
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    elapsed = time.perf_counter() - start
+    if process.returncode:
+        raise Exception('exporter.py %s failed:\n%s' % (
+            ' '.join(args), process.stdout + process.stderr))
+    return (elapsed,) + parse_importtime(process.stderr)
+
+
+def write_config(path, config, timelog_file):
+    with open(path, 'w') as f:
+        f.write('[gtimelog_exporter]\n')
+        for key in ('jira_url', 'tempo_url', 'jira_account_email',
+                    'odoo_url', 'odoo_port', 'odoo_protocol', 'odoo_db',
+                    'odoo_user'):
+            f.write('{} = {}\n'.format(key, config[key]))
+        f.write('timelog_file = {}\n'.format(timelog_file))
+
+
+def in_sync_state(timelog_file, issue_count):
+    """Mock data matching the timelog week, so the sync has nothing to do"""
+    from exporter import DateWindow
+    from wrappers.gtimelog_parser import GtimelogParser
+
+    window = DateWindow(WEEK_START, WEEK_START + timedelta(
+        days=6, hours=23, minutes=59, seconds=59))
+    parser = GtimelogParser({
+        'timelog_file': timelog_file, 'no_timelog_index': 1, 'aliases': {},
+    })
+    attendances, logs = parser.get_entries(window)
+    issue_ids = synthetic.issues(issue_count)
+    return MockState(
+        issues=issue_ids,
+        worklogs=synthetic.tempo_worklogs(logs, issue_ids, changed=0,
+                                          missing=0, extra=0),
+        attendances=synthetic.odoo_attendances(attendances, missing=0),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--targets', nargs='+', choices=TARGETS,
+                        default=list(TARGETS))
+    parser.add_argument('--runs', type=int, default=5,
+                        help='runs per target, the fastest one is reported')
+    parser.add_argument('--top', type=int, default=8,
+                        help='number of top level imports to list')
+    parser.add_argument('--issues', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            XDG_CACHE_HOME=join(workdir, 'cache'),
+            TZ='UTC',
+            JIRA_API_TOKEN='jira-token',
+            TEMPO_API_TOKEN='tempo-token',
+            ODOO_PASSWORD='mock',
+        )
+        timelog_file = join(workdir, 'timelog.txt')
+        synthetic.write_timelog(
+            timelog_file, (WEEK_START - timedelta(days=365)).date(),
+            (WEEK_START + timedelta(days=6)).date(),
+            issue_count=args.issues)
+        config_file = join(workdir, 'gtimelogrc')
+        sync_args = ['-c', config_file, '--no-interactive',
+                     '--from', WEEK_START.date().isoformat(),
+                     '--to', WEEK_START.date().isoformat()]
+        commands = {
+            'help': ['--help'],
+            'noop': sync_args,
+            'noop-no-attendance': sync_args + ['--no-attendance'],
+        }
+
+        with MockServer(in_sync_state(timelog_file, args.issues)) as server:
+            write_config(config_file, server.config(), timelog_file)
+            for target in args.targets:
+                # fill the caches and the timelog index first
+                run(commands[target], env)
+                elapsed, imports, top_level = min(
+                    run(commands[target], env) for _i in range(args.runs)
+                )
+                print('{:<20} {:>8.3f}s wall {:>8.3f}s imports'.format(
+                    target, elapsed, imports))
+                top_level.sort(key=lambda module: -module[1])
+                for name, seconds in top_level[:args.top]:
+                    print('    {:<32} {:>8.3f}s'.format(name, seconds))
+                print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""Benchmark a whole sync against the local mock servers
+
+For each window size, a synthetic timelog is written, the mock Tempo and
+Odoo are seeded with slightly outdated data, then the sync runs phase by
+phase. Each phase reports its HTTP requests, Odoo RPC calls, wall time
+and peak memory (Python allocations, through tracemalloc).
+
+    python benchmarks/bench_sync.py [--windows day week month year]
+                                    [--latency 0.02] [--rate-limit-every 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+from datetime import date, timedelta
+from os.path import dirname, join, realpath
+
+sys.path.insert(0, dirname(dirname(realpath(__file__))))
+
+import synthetic  # noqa: E402
+from mock_server import MockServer, MockState  # noqa: E402
+
+WINDOW_DAYS = {
+    'day': 1,
+    'week': 7,
+    'month': 28,
+    'quarter': 91,
+    'year': 364,
+}
+# a monday
+LAST_WINDOW_START = date(2023, 12, 25)
+
+
+class PhaseRecorder(object):
+
+    def __init__(self, server, memory=True):
+        self.server = server
+        self.memory = memory
+        self.phases = []
+
+    def odoo_calls(self):
+        return sum(count for endpoint, count in self.server.counts.items()
+                   if endpoint == 'POST /jsonrpc')
+
+    @contextmanager
+    def phase(self, name):
+        requests = self.server.http_requests() - self.odoo_calls()
+        calls = self.odoo_calls()
+        if self.memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = 0
+            if self.memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            self.phases.append((
+                name,
+                self.server.http_requests() - self.odoo_calls() - requests,
+                self.odoo_calls() - calls,
+                elapsed,
+                peak,
+            ))
+
+
+def run_window(name, args, workdir):
+    # imported late, once XDG_CACHE_HOME points to the temporary directory
+    from exporter import DateWindow, Utils, reconcile_weeks
+    from wrappers.gtimelog_parser import GtimelogParser
+    from wrappers.jira_client import JiraClient
+    from wrappers.odoo_client import OdooClient
+    from wrappers.write_executor import WriteExecutor
+
+    days = WINDOW_DAYS[name]
+    # windows end with the last week, a single day is its monday
+    first_day = LAST_WINDOW_START + timedelta(days=min(days, 7) - days)
+    last_day = first_day + timedelta(days=days - 1)
+    timelog_file = join(workdir, '%s-timelog.txt' % name)
+    # history before the window, as in a real timelog
+    synthetic.write_timelog(timelog_file, first_day - timedelta(days=365 * 2),
+                            last_day, issue_count=args.issues)
+    issue_ids = synthetic.issues(args.issues)
+
+    date_windows = Utils.week_windows(first_day, last_day)
+    if days == 1:
+        date_windows = [DateWindow(
+            date_windows[0].start + timedelta(days=first_day.weekday()),
+            date_windows[0].start + timedelta(days=first_day.weekday(),
+                                              hours=23, minutes=59, seconds=59)
+        )]
+    date_window = DateWindow(date_windows[0].start, date_windows[-1].stop)
+
+    # seed the mock from the timelog
+    seed_config = {'timelog_file': timelog_file, 'no_timelog_index': 1}
+    attendances, logs = GtimelogParser(seed_config).get_entries(date_window)
+    state = MockState(
+        issues=issue_ids,
+        worklogs=synthetic.tempo_worklogs(logs, issue_ids),
+        attendances=synthetic.odoo_attendances(attendances),
+    )
+
+    with MockServer(state, latency=args.latency,
+                    rate_limit_every=args.rate_limit_every) as server:
+        config = server.config()
+        config.update({
+            'timelog_file': timelog_file,
+            'aliases': {},
+            'date_window': date_window,
+            'date_windows': date_windows,
+        })
+        recorder = PhaseRecorder(server, memory=not args.no_memory)
+
+        with recorder.phase('parse'):
+            attendances, gt_logs = GtimelogParser(config).get_entries(
+                date_window)
+        with recorder.phase('fetch'):
+            jira = JiraClient(config)
+            jira_logs = list(jira.get_worklogs(date_window))
+        with recorder.phase('resolve'):
+            jira_logs, _errors = jira.populate_issue_field(jira_logs)
+            gt_logs, gt_errors = jira.populate_issue_field(gt_logs)
+        with recorder.phase('diff'):
+            weeks = reconcile_weeks(date_windows, jira_logs, gt_logs,
+                                    gt_errors, attendances)
+        with recorder.phase('write'):
+            writer = WriteExecutor()
+            for week in weeks:
+                for log in week.to_create:
+                    writer.add('create', log.description,
+                               jira.create_worklog, log)
+                for old_log, new_log in week.to_update:
+                    writer.add('update', new_log.description,
+                               jira.update_worklog, old_log, new_log)
+                for log in week.to_delete:
+                    writer.add('delete', log.description,
+                               jira.delete_worklog, log)
+            results = writer.run()
+        with recorder.phase('attendance'):
+            odoo = OdooClient(config)
+            odoo.apply_attendance_diff(
+                odoo.diff_attendances(date_window, attendances))
+
+    failed = len([result for result in results if not result.ok])
+    return len(gt_logs), len(results), failed, recorder.phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--windows', nargs='+', choices=list(WINDOW_DAYS),
+                        default=['day', 'week', 'month', 'year'])
+    parser.add_argument('--issues', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='delay of each mock answer, in seconds')
+    parser.add_argument('--rate-limit-every', type=int, default=0,
+                        help='answer one Tempo write out of N with a 429')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='do not trace memory, tracing slows down Python')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # start with empty caches
+        os.environ['XDG_CACHE_HOME'] = join(workdir, 'cache')
+        print('{:<8} {:<11} {:>8} {:>6} {:>9} {:>10}'.format(
+            'window', 'phase', 'requests', 'rpc', 'time', 'peak'))
+        for name in args.windows:
+            logs, writes, failed, phases = run_window(name, args, workdir)
+            for phase, requests, calls, elapsed, peak in phases:
+                print('{:<8} {:<11} {:>8} {:>6} {:>8.3f}s {:>8.1f}KB'.format(
+                    name, phase, requests, calls, elapsed, peak / 1024))
+            total = sum(phase[3] for phase in phases)
+            print('{:<8} {:<11} {:>8} {:>6} {:>8.3f}s  {} logs, {} writes, '
+                  '{} failed'.format(
+                      name, 'total', sum(phase[1] for phase in phases),
+                      sum(phase[2] for phase in phases), total,
+                      logs, writes, failed))
+            print()
+
+
+if __name__ == '__main__':
+    main()
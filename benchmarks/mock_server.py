@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Jira, Tempo and Odoo APIs used by the exporter
+
+A multithreaded HTTP server answers on:
+
+* `/jira/` for the Jira REST API (myself, issue, search, user, user/bulk)
+* `/tempo/4/` for the Tempo API (worklogs, timesheet-approvals)
+* `/jsonrpc` and `/web/webclient/version_info` for Odoo JSON-RPC
+
+Every request can be delayed by `latency` seconds and one Tempo write out
+of `rate_limit_every` is answered with a 429. Requests are counted per
+endpoint in `MockServer.counts`.
+
+Run it standalone to point an exporter configuration at it:
+
+    python benchmarks/mock_server.py --port 8000 --latency 0.05
+"""
+import argparse
+import base64
+import json
+import re
+import threading
+import time
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+ACCOUNT_ID = 'mock-account-id'
+JIRA_AUTH = 'Basic ' + base64.b64encode(
+    b'mock@example.com:jira-token').decode()
+EMPLOYEE_ID = 1
+# placeholders used to count requests per endpoint
+ENDPOINT_PATTERNS = [
+    (re.compile(r'/worklogs/\d+$'), '/worklogs/{id}'),
+    (re.compile(r'/issue/[^/]+$'), '/issue/{ref}'),
+    (re.compile(r'/user/%s' % ACCOUNT_ID), '/user/{accountId}'),
+]
+
+
+class MockState(object):
+    """Data served by the mock, shared by all requests"""
+
+    def __init__(self, issues=None, worklogs=None, attendances=None,
+                 locked_attendances=()):
+        # id -> key
+        self.issues = dict(issues or {})
+        # tempoWorklogId -> tempo worklog
+        self.worklogs = {}
+        self.attendances = {}
+        self.locked_attendances = set(locked_attendances)
+        self._next_id = 1
+        self.lock = threading.Lock()
+        for worklog in worklogs or ():
+            self.add_worklog(worklog)
+        for attendance in attendances or ():
+            self.add_attendance(attendance)
+
+    def next_id(self):
+        self._next_id += 1
+        return self._next_id
+
+    def add_worklog(self, values):
+        worklog_id = self.next_id()
+        self.worklogs[worklog_id] = {
+            'tempoWorklogId': worklog_id,
+            'issue': {'id': int(values['issueId'])},
+            'timeSpentSeconds': values['timeSpentSeconds'],
+            'startDate': values['startDate'],
+            'startTime': values.get('startTime', '02:00:00'),
+            'description': values.get('description', ''),
+            'author': {'accountId': ACCOUNT_ID},
+            'updatedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        }
+        return self.worklogs[worklog_id]
+
+    def add_attendance(self, values):
+        attendance_id = self.next_id()
+        self.attendances[attendance_id] = dict(
+            values, id=attendance_id, employee_id=EMPLOYEE_ID
+        )
+        return attendance_id
+
+    def issue_by_ref(self, ref):
+        ref = str(ref)
+        if ref in self.issues:
+            return ref, self.issues[ref]
+        for issue_id, key in self.issues.items():
+            if key.upper() == ref.upper():
+                return issue_id, key
+        return None
+
+
+class MockHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def _endpoint(self, method, path):
+        for pattern, placeholder in ENDPOINT_PATTERNS:
+            path = pattern.sub(placeholder, path)
+        return '{} {}'.format(method, path)
+
+    def _send(self, status, data=None, headers=None):
+        body = json.dumps(data).encode() if data is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'null')
+
+    def _handle(self, method):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        body = self._body() if method in ('POST', 'PUT') else None
+        self.server.count(self._endpoint(method, url.path))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if url.path.startswith('/tempo/') and method != 'GET' \
+                and self.server.should_rate_limit():
+            return self._send(429, {'errors': ['rate limited']},
+                              {'Retry-After': str(self.server.retry_after)})
+        try:
+            if url.path.startswith('/jira/'):
+                return self._jira(method, url.path[len('/jira'):], query,
+                                  body)
+            if url.path.startswith('/tempo/4/'):
+                return self._tempo(method, url.path[len('/tempo/4'):], query,
+                                   body)
+            if url.path == '/web/webclient/version_info':
+                return self._send(200, {'jsonrpc': '2.0', 'result': {
+                    'server_version': '14.0',
+                    'server_version_info': [14, 0, 0, 'final', 0, ''],
+                }})
+            if url.path == '/jsonrpc':
+                return self._odoo(body)
+        except Exception as e:
+            return self._send(500, {'errors': [repr(e)]})
+        return self._send(404, {'errors': ['not found']})
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    # Jira
+
+    def _jira(self, method, path, query, body):
+        if self.headers.get('Authorization') != JIRA_AUTH:
+            return self._send(401, {'errorMessages': ['unauthorized']})
+        if path == '/rest/api/3/myself':
+            return self._send(200, {'accountId': ACCOUNT_ID})
+        if path == '/rest/api/3/search':
+            return self._jira_search(query)
+        if path == '/rest/api/3/user':
+            return self._send(200, self._jira_user(query['accountId']))
+        if path == '/rest/api/3/user/bulk':
+            return self._jira_users(
+                parse_qs(urlparse(self.path).query).get('accountId', []), query)
+        match = re.match(r'^/rest/api/(?:latest|3)/issue/([^/]+)$', path)
+        if match:
+            issue = self.state.issue_by_ref(match.group(1))
+            if not issue:
+                return self._send(404, {'errorMessages': ['Not Found']})
+            if method == 'PUT':
+                return self._send(204)
+            return self._send(200, self._jira_issue(*issue))
+        return self._send(404, {'errorMessages': ['Not Found']})
+
+    def _jira_issue(self, issue_id, key):
+        spent = sum(
+            worklog['timeSpentSeconds']
+            for worklog in self.state.worklogs.values()
+            if str(worklog['issue']['id']) == str(issue_id)
+        )
+        return {
+            'id': str(issue_id),
+            'key': key,
+            'fields': {'timetracking': {
+                'originalEstimate': '1w',
+                'originalEstimateSeconds': 40 * 3600,
+                'remainingEstimate': '1w',
+                'remainingEstimateSeconds': 40 * 3600,
+                'timeSpentSeconds': spent,
+            }},
+        }
+
+    def _jira_user(self, account_id):
+        return {
+            'accountId': account_id,
+            'displayName': 'Reviewer %s' % account_id,
+        }
+
+    def _jira_users(self, account_ids, query):
+        start_at = int(query.get('startAt', 0))
+        max_results = int(query.get('maxResults', 10))
+        page = account_ids[start_at:start_at + max_results]
+        return self._send(200, {
+            'startAt': start_at,
+            'maxResults': max_results,
+            'total': len(account_ids),
+            'isLast': start_at + max_results >= len(account_ids),
+            'values': [self._jira_user(account_id) for account_id in page],
+        })
+
+    def _jira_search(self, query):
+        refs = re.findall(r'"((?:[^"\\]|\\.)*)"', query.get('jql', ''))
+        issues = []
+        for ref in refs:
+            issue = self.state.issue_by_ref(ref)
+            if issue and issue not in issues:
+                issues.append(issue)
+        start_at = int(query.get('startAt', 0))
+        max_results = int(query.get('maxResults', 50))
+        page = issues[start_at:start_at + max_results]
+        return self._send(200, {
+            'startAt': start_at,
+            'maxResults': max_results,
+            'total': len(issues),
+            'issues': [self._jira_issue(*issue) for issue in page],
+        })
+
+    # Tempo
+
+    def _tempo(self, method, path, query, body):
+        if not self.headers.get('Authorization'):
+            return self._send(401, {'errors': ['unauthorized']})
+        if path == '/worklogs/user/%s' % ACCOUNT_ID:
+            return self._tempo_worklogs(query)
+        if path == '/worklogs' and method == 'POST':
+            with self.state.lock:
+                return self._send(200, self.state.add_worklog(body))
+        match = re.match(r'^/worklogs/(\d+)$', path)
+        if match:
+            worklog_id = int(match.group(1))
+            with self.state.lock:
+                if worklog_id not in self.state.worklogs:
+                    return self._send(404, {'errors': ['not found']})
+                if method == 'DELETE':
+                    del self.state.worklogs[worklog_id]
+                    return self._send(204)
+                if method == 'PUT':
+                    worklog = self.state.worklogs[worklog_id]
+                    worklog.update({
+                        'issue': {'id': int(body['issueId'])},
+                        'timeSpentSeconds': body['timeSpentSeconds'],
+                        'startDate': body['startDate'],
+                        'description': body.get('description', ''),
+                        'updatedAt': time.strftime(
+                            '%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                    })
+                    return self._send(200, worklog)
+        approvals = '/timesheet-approvals/user/%s' % ACCOUNT_ID
+        if path == approvals:
+            return self._send(200, {'status': {'key': 'OPEN'}})
+        if path == approvals + '/reviewers':
+            return self._send(200, {'results': [{
+                'accountId': 'reviewer-%d' % i,
+                'self': '%s/jira/rest/api/3/user?accountId=reviewer-%d' % (
+                    self.server.url, i),
+            } for i in range(1, 4)]})
+        if path == approvals + '/submit':
+            return self._send(200, {'status': {'key': 'WAITING_FOR_APPROVAL'}})
+        return self._send(404, {'errors': ['not found']})
+
+    def _tempo_worklogs(self, query):
+        with self.state.lock:
+            worklogs = sorted(
+                (worklog for worklog in self.state.worklogs.values()
+                 if query['from'] <= worklog['startDate'] <= query['to']),
+                key=lambda worklog: (worklog['startDate'],
+                                     worklog['tempoWorklogId'])
+            )
+        offset = int(query.get('offset', 0))
+        limit = int(query.get('limit', 50))
+        page = worklogs[offset:offset + limit]
+        metadata = {'count': len(page), 'offset': offset, 'limit': limit}
+        if offset + limit < len(worklogs):
+            metadata['next'] = '{}/tempo/4/worklogs/user/{}?{}'.format(
+                self.server.url, ACCOUNT_ID,
+                urlencode(dict(query, offset=offset + limit))
+            )
+        return self._send(200, {'metadata': metadata, 'results': page})
+
+    # Odoo
+
+    def _odoo(self, body):
+        params = body['params']
+        request_id = body.get('id')
+        try:
+            if params['service'] == 'common' and params['method'] == 'login':
+                result = 2
+            elif params['method'] == 'execute':
+                model, method = params['args'][3:5]
+                result = self._odoo_call(model, method, params['args'][5:], {})
+            else:
+                model, method, args, kwargs = params['args'][3:7]
+                result = self._odoo_call(model, method, args, kwargs)
+        except OdooError as e:
+            self.server.count('odoo error')
+            return self._send(200, {'jsonrpc': '2.0', 'id': request_id,
+                                    'error': {'code': 200, 'message': str(e),
+                                              'data': {'name': 'UserError',
+                                                       'message': str(e)}}})
+        return self._send(200, {'jsonrpc': '2.0', 'id': request_id,
+                                'result': result})
+
+    def _odoo_call(self, model, method, args, kwargs):
+        self.server.count('odoo {}.{}'.format(model, method))
+        if method == 'context_get':
+            return {'lang': 'en_US', 'tz': 'UTC'}
+        if method == 'fields_get':
+            return {}
+        if model != 'hr.attendance':
+            raise OdooError('unknown model %s' % model)
+        state = self.state
+        with state.lock:
+            if method == 'default_get':
+                return {'employee_id': EMPLOYEE_ID}
+            if method in ('search', 'search_read'):
+                records = [record for record in state.attendances.values()
+                           if match_domain(record, args[0])]
+                if method == 'search':
+                    return [record['id'] for record in records]
+                fields = args[1] if len(args) > 1 else kwargs.get('fields')
+                return [
+                    {k: v for k, v in record.items()
+                     if not fields or k in fields or k == 'id'}
+                    for record in records
+                ]
+            if method == 'read':
+                ids = args[0] if isinstance(args[0], list) else [args[0]]
+                return [dict(state.attendances[i]) for i in ids
+                        if i in state.attendances]
+            if method == 'unlink':
+                ids = args[0] if isinstance(args[0], list) else [args[0]]
+                if state.locked_attendances.intersection(ids):
+                    raise OdooError('period closed')
+                for attendance_id in ids:
+                    state.attendances.pop(attendance_id, None)
+                return True
+            if method == 'write':
+                for attendance_id in args[0]:
+                    state.attendances[attendance_id].update(args[1])
+                return True
+            if method == 'create':
+                if isinstance(args[0], list):
+                    return [state.add_attendance(v) for v in args[0]]
+                return state.add_attendance(args[0])
+        raise OdooError('unknown method %s' % method)
+
+
+class OdooError(Exception):
+    pass
+
+
+def match_domain(record, domain):
+    """Evaluate a (prefix notation) Odoo domain on a record"""
+    operators = {
+        '=': lambda a, b: a == b or (b is None and a is False),
+        '>=': lambda a, b: a is not False and a >= b,
+        '<=': lambda a, b: a is not False and a <= b,
+    }
+
+    def evaluate(position):
+        term = domain[position]
+        if term in ('|', '&'):
+            left, position = evaluate(position + 1)
+            right, position = evaluate(position)
+            return (left or right) if term == '|' else (left and right), \
+                position
+        field, operator, value = term
+        return operators[operator](record.get(field, False), value), \
+            position + 1
+
+    position = 0
+    result = True
+    while position < len(domain):
+        value, position = evaluate(position)
+        result = result and value
+    return result
+
+
+class MockServer(ThreadingHTTPServer):
+    """Mock server running in a background thread
+
+    Use it as a context manager; `config()` returns the exporter
+    configuration pointing to it.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, state=None, port=0, latency=0, rate_limit_every=0,
+                 retry_after=1):
+        super().__init__(('127.0.0.1', port), MockHandler)
+        self.state = state or MockState()
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        # whole seconds, as Tempo sends it
+        self.retry_after = int(retry_after)
+        self.counts = Counter()
+        self._requests = 0
+        self._count_lock = threading.Lock()
+        self.url = 'http://127.0.0.1:%d' % self.server_address[1]
+
+    def count(self, endpoint):
+        with self._count_lock:
+            self.counts[endpoint] += 1
+
+    def should_rate_limit(self):
+        with self._count_lock:
+            self._requests += 1
+            return bool(self.rate_limit_every) \
+                and self._requests % self.rate_limit_every == 0
+
+    def http_requests(self):
+        """Number of HTTP requests received"""
+        return sum(count for endpoint, count in self.counts.items()
+                   if not endpoint.startswith('odoo '))
+
+    def config(self):
+        return {
+            'jira_url': self.url + '/jira/',
+            'tempo_url': self.url + '/tempo/4/',
+            'jira_account_email': 'mock@example.com',
+            'jira_api_token': 'jira-token',
+            'tempo_api_token': 'tempo-token',
+            'odoo_url': 'http://127.0.0.1/',
+            'odoo_port': self.server_address[1],
+            'odoo_protocol': 'jsonrpc',
+            'odoo_db': 'mock',
+            'odoo_user': 'mock',
+            'odoo_password': 'mock',
+            'tz_offset': 0,
+        }
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0,
+                        help='delay of each answer, in seconds')
+    parser.add_argument('--rate-limit-every', type=int, default=0,
+                        help='answer one Tempo write out of N with a 429')
+    parser.add_argument('--issues', type=int, default=50,
+                        help='number of issues, keys are PROJ-1 to PROJ-N')
+    args = parser.parse_args()
+
+    state = MockState(issues={
+        str(10000 + i): 'PROJ-%d' % i for i in range(1, args.issues + 1)
+    })
+    with MockServer(state, port=args.port, latency=args.latency,
+                    rate_limit_every=args.rate_limit_every) as server:
+        config = server.config()
+        print('[gtimelog_exporter]')
+        for key in ('jira_url', 'tempo_url', 'jira_account_email',
+                    'odoo_url', 'odoo_port', 'odoo_protocol', 'odoo_db',
+                    'odoo_user'):
+            print('{} = {}'.format(key, config[key]))
+        print()
+        print('Use jira-token as Jira API token, any other token and '
+              'password are accepted. Ctrl-C to stop.')
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
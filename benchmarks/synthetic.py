@@ -0,0 +1,80 @@
+"""Synthetic gtimelog timelogs and Tempo / Odoo data for the benchmarks"""
+import random
+
+from datetime import datetime, timedelta
+
+
+def issues(count):
+    """Issues of the mock Jira, as an id -> key dict"""
+    return {str(10000 + i): 'PROJ-%d' % i for i in range(1, count + 1)}
+
+
+def write_timelog(path, first_day, last_day, issue_count=50,
+                  entries_per_day=8, seed=42):
+    """Write a timelog with entries on each working day of the range"""
+    rand = random.Random(seed)
+    day = first_day
+    with open(path, 'w', encoding='utf-8') as f:
+        while day <= last_day:
+            if day.weekday() < 5:
+                time = datetime.combine(day, datetime.min.time()) \
+                    + timedelta(hours=8)
+                f.write('{:%Y-%m-%d %H:%M}: arrived\n'.format(time))
+                for i in range(entries_per_day):
+                    time += timedelta(minutes=rand.choice((15, 30, 45, 60)))
+                    if i == entries_per_day // 2:
+                        # lunch break, splits attendances
+                        time += timedelta(minutes=45)
+                        f.write('{:%Y-%m-%d %H:%M}: lunch **\n'.format(time))
+                        continue
+                    f.write('{:%Y-%m-%d %H:%M}: PROJ-{}: {} | note\n'.format(
+                        time,
+                        rand.randint(1, issue_count),
+                        rand.choice(('Daily', 'Review', 'Development',
+                                     'Support', 'Meeting')),
+                    ))
+                f.write('\n')
+            day += timedelta(days=1)
+
+
+def tempo_worklogs(logs, issue_ids, changed=0.1, missing=0.05, extra=0.05,
+                   seed=7):
+    """Tempo worklogs for `logs`, as if the previous sync was outdated
+
+    `changed` of them have another duration (update), `missing` are not
+    in Tempo (create) and `extra` were removed from gtimelog (delete).
+    """
+    rand = random.Random(seed)
+    ids_by_key = {key: issue_id for issue_id, key in issue_ids.items()}
+    worklogs = []
+    for log in logs:
+        draw = rand.random()
+        if draw < missing:
+            continue
+        values = {
+            'issueId': ids_by_key[log.issue],
+            'timeSpentSeconds': log.duration,
+            'startDate': log.date.isoformat(),
+            'description': log.comment,
+        }
+        if draw < missing + changed:
+            values['timeSpentSeconds'] += 900
+        worklogs.append(values)
+        if draw > 1 - extra:
+            worklogs.append(dict(values, description='Removed entry'))
+    return worklogs
+
+
+def odoo_attendances(attendances, tz_offset=0, missing=0.1, seed=3):
+    """Odoo attendances for gtimelog `attendances`, some being missing"""
+    rand = random.Random(seed)
+    delta = timedelta(seconds=tz_offset)
+    return [
+        {
+            'check_in': (check_in - delta).strftime('%Y-%m-%d %H:%M:%S'),
+            'check_out': check_out and (check_out - delta).strftime(
+                '%Y-%m-%d %H:%M:%S'),
+        }
+        for check_in, check_out in attendances
+        if rand.random() >= missing
+    ]
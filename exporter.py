@@ -6,34 +6,39 @@ import configparser
 import pathlib
 
 from builtins import input
-from collections import namedtuple
-from datetime import datetime, date, timedelta
+from collections import defaultdict, namedtuple
+from contextlib import nullcontext
+from datetime import datetime, date, time, timedelta
 from getpass import getpass
 from os import environ as env
 from os.path import dirname, realpath
 from itertools import groupby
 
-try:
-    from tzlocal import get_localzone
-except ImportError:
-    print('you have to install tzlocal (pip install tzlocal)')
-    sys.exit()
-
-from wrappers.jira_client import JiraClient
-from wrappers.gtimelog_parser import GtimelogParser
-from wrappers.odoo_client import OdooClient
+# Backends (Jira, gtimelog, Odoo) are imported when used, to keep the
+# start up fast, e.g. Odoo is never loaded with --no-attendance
+from wrappers.aggregate import AGGREGATE_MODES, aggregate_logs
 from wrappers.multi_log import MultiLog
+from wrappers.sync_plan import SyncPlan
+from wrappers.reconcile import reconcile
 
 DEFAULT_CONFIG_PATH = dirname(realpath(__file__)) + '/gtimelogrc'
 DateWindow = namedtuple('DateWindow', 'start stop')
-
-tz = get_localzone()
-utcnow = datetime.now(tz)
-tz_offset = utcnow.utcoffset().total_seconds()
+WeekSync = namedtuple(
+    'WeekSync', 'window to_create to_update to_delete to_check attendances'
+)
 
 
 class Utils:
 
+    @staticmethod
+    def local_tz_offset():
+        try:
+            from tzlocal import get_localzone
+        except ImportError:
+            print('you have to install tzlocal (pip install tzlocal)')
+            sys.exit()
+        return datetime.now(get_localzone()).utcoffset().total_seconds()
+
     @staticmethod
     def current_weeknumber():
         return int(datetime.now().strftime("%W"))
@@ -68,6 +73,43 @@ class Utils:
                                          seconds=59)
         return weekstart, weekstop
 
+    @staticmethod
+    def parse_date(value):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+
+    @staticmethod
+    def week_windows(first_day, last_day):
+        """Split the weeks containing first_day to last_day in windows"""
+        if last_day < first_day:
+            raise Exception('The end of the range must be after its start.')
+        monday = first_day - timedelta(days=first_day.weekday())
+        windows = []
+        while monday <= last_day:
+            weekstart = datetime.combine(monday, time())
+            weekstop = weekstart + timedelta(days=6, hours=23, minutes=59,
+                                             seconds=59)
+            windows.append(DateWindow(weekstart, weekstop))
+            monday += timedelta(weeks=1)
+        return windows
+
+    @staticmethod
+    def parse_date_windows(args):
+        """Return the week windows to synchronize
+
+        Either the weeks between `--from` and `--to` or the `--weeks`
+        last weeks up to the selected one. With only one of `--from` and
+        `--to`, its week is synchronized.
+        """
+        if args.date_from or args.date_to:
+            return Utils.week_windows(args.date_from or args.date_to,
+                                      args.date_to or args.date_from)
+        week, year = Utils.parse_week(args)
+        weekstart, _weekstop = Utils.date_range_for_week(week, year)
+        return Utils.week_windows(
+            (weekstart - timedelta(weeks=max(args.weeks, 1) - 1)).date(),
+            weekstart.date()
+        )
+
     @staticmethod
     def ask_confirmation():
         print()
@@ -129,11 +171,16 @@ class Utils:
                 'Not all mandatory fields are present '
                 'in %s config file.' % config_file)
 
-        week, year = Utils.parse_week(args)
+        result['date_windows'] = Utils.parse_date_windows(args)
         result['date_window'] = DateWindow(
-            *Utils.date_range_for_week(week, year)
+            result['date_windows'][0].start, result['date_windows'][-1].stop
         )
-        result['tz_offset'] = tz_offset
+        result['tz_offset'] = Utils.local_tz_offset()
+        result['aggregate'] = args.aggregate or result.get('aggregate', 'none')
+        if result['aggregate'] not in AGGREGATE_MODES:
+            raise Exception(
+                "aggregate must be one of %s in %s config file." % (
+                    ', '.join(AGGREGATE_MODES), config_file))
 
         if config.has_section('gtimelog_exporter:aliases'):
             result['aliases'] = dict(config.items('gtimelog_exporter:aliases'))
@@ -142,6 +189,13 @@ class Utils:
 
         return result
 
+    @classmethod
+    def report_week_header(cls, window):
+        title = "Week {} → {}".format(window.start.date(), window.stop.date())
+        print()
+        print(title)
+        print("#" * len(title))
+
     @classmethod
     def _report_log(cls, logs):
         for day, day_logs in groupby(logs, key=lambda e: e.date):
@@ -154,13 +208,30 @@ class Utils:
                     print("      ", log.human_duration, ":", log.comment)
 
     @classmethod
-    def report(cls, to_create, to_delete, to_check, attendances=None):
+    def _report_update(cls, pairs):
+        for day, day_pairs in groupby(pairs, key=lambda p: p[1].date):
+            print("  ", day)
+            for issue, issue_pairs \
+                    in groupby(day_pairs, key=lambda p: p[1].issue):
+                print("    ", issue)
+                for old, new in issue_pairs:
+                    print("      ", new.human_duration, ":", new.comment,
+                          "(was", old.human_duration, ":", old.comment + ")")
+
+    @classmethod
+    def report(cls, to_create, to_update, to_delete, to_check,
+               attendances=None):
         print("Jira Worklogs")
         print("=============")
         if to_create:
             print("Create")
             cls._report_log(to_create)
 
+        if to_update:
+            print()
+            print("Update")
+            cls._report_update(to_update)
+
         if to_delete:
             print()
             print("Delete")
@@ -187,7 +258,7 @@ class Utils:
                     ))
 
 
-def get_odoo_conf(config):
+def get_odoo_conf(config, args):
     odoo_config = config.copy()
     odoo_password = env.get('ODOO_PASSWORD')
     if not odoo_password:
@@ -199,39 +270,665 @@ def get_odoo_conf(config):
     return odoo_config
 
 
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description="gtimelog_exporter options")
+def split_by_week(items, date_windows, key):
+    """Dispatch `items` in the week windows containing their `key` date"""
+    window_by_day = {
+        window.start.date() + timedelta(days=day): window
+        for window in date_windows
+        for day in range(7)
+    }
+    result = {window: [] for window in date_windows}
+    for item in items:
+        window = window_by_day.get(key(item))
+        if window:
+            result[window].append(item)
+    return result
+
+
+def reconcile_weeks(date_windows, jira_logs, gt_logs, gt_errors, attendances):
+    """Reconcile worklogs week by week"""
+    jira_logs = split_by_week(jira_logs, date_windows, lambda log: log.date)
+    gt_logs = split_by_week(gt_logs, date_windows, lambda log: log.date)
+    errors = split_by_week(
+        [(reason, log) for reason, logs in gt_errors.items() for log in logs],
+        date_windows,
+        lambda error: error[1].date,
+    )
+    attendances = split_by_week(
+        attendances, date_windows, lambda attendance: attendance[0].date()
+    )
+    weeks = []
+    for window in date_windows:
+        to_create, to_update, to_delete, _ = reconcile(
+            jira_logs[window], gt_logs[window]
+        )
+        to_check = defaultdict(list)
+        for reason, log in errors[window]:
+            to_check[reason].append(log)
+        weeks.append(WeekSync(
+            window, to_create, to_update, to_delete, to_check,
+            attendances[window]
+        ))
+    return weeks
+
+
+def local_fingerprints(config, gt_logs, attendances, no_attendance):
+    """Fingerprint, for each week, of what the exporter would push
+
+    It must be computed before issues are resolved, which updates the logs.
+    """
+    from wrappers.sync_journal import SyncJournal
+
+    settings = [config['aggregate']]
+    if not no_attendance:
+        settings += [config.get('odoo_url'), config.get('odoo_db'),
+                     config.get('odoo_user')]
+    date_windows = config['date_windows']
+    gt_logs = split_by_week(gt_logs, date_windows, lambda log: log.date)
+    attendances = split_by_week(
+        attendances, date_windows, lambda attendance: attendance[0].date()
+    )
+    return {
+        window: SyncJournal.fingerprint(
+            settings,
+            [log.sync_key for log in gt_logs[window]],
+            None if no_attendance else attendances[window],
+        )
+        for window in date_windows
+    }
+
+
+def remote_fingerprints(date_windows, versions):
+    """Fingerprint, for each week, of the Tempo worklogs versions"""
+    from wrappers.sync_journal import SyncJournal
+
+    versions = split_by_week(versions, date_windows,
+                             lambda version: version[1])
+    return {
+        window: SyncJournal.fingerprint(sorted(
+            (worklog_id, updated_at)
+            for worklog_id, _date, updated_at in versions[window]
+        ))
+        for window in date_windows
+    }
+
+
+def unchanged_weeks(journal, jira, date_windows, local):
+    """Return the weeks unchanged since they were last synchronized
+
+    Only weeks whose gtimelog entries did not change are checked in Tempo,
+    with a single request for all of them.
+    """
+    recorded = {window: journal.get(window.start.isoformat())
+                for window in date_windows}
+    candidates = [window for window in date_windows
+                  if recorded[window]
+                  and recorded[window].local == local[window]]
+    if not candidates:
+        return []
+    remote = remote_fingerprints(candidates, jira.get_worklog_versions(
+        DateWindow(candidates[0].start, candidates[-1].stop)
+    ))
+    return [window for window in candidates
+            if recorded[window].remote == remote[window]]
+
+
+def build_plan_worklogs(weeks):
+    """Worklogs operations of a `SyncPlan`"""
+    return (
+        [('create', log, None) for week in weeks for log in week.to_create]
+        + [('update', new_log, old_log)
+           for week in weeks for old_log, new_log in week.to_update]
+        + [('delete', log, None) for week in weeks for log in week.to_delete]
+    )
+
+
+def profile_name(config):
+    """Identify the Tempo account synchronized"""
+    return '{}|{}'.format(config['tempo_url'], config['jira_account_email'])
+
+
+def skip_made_creates(plan, jira, pending):
+    """Checkpoint the pending creates made by an interrupted run
+
+    Tempo worklogs unknown when the plan was computed, and not created by
+    a checkpointed operation, were created by the interrupted run.
+    """
+    known = plan.known_worklogs | set(plan.done.values())
+    made = defaultdict(list)
+    for log in jira.get_worklogs(DateWindow(*plan.date_window)):
+        if log.worklog_id not in known:
+            made[(log.id, log.duration, log.date, log.comment)].append(
+                log.worklog_id)
+    remaining = []
+    for operation, (kind, log, old_log) in pending:
+        key = (log.id, log.duration, log.date, log.comment)
+        if kind == 'create' and made[key]:
+            plan.checkpoint(operation, made[key].pop())
+        else:
+            remaining.append((operation, (kind, log, old_log)))
+    return remaining
+
+
+def apply_plan(config, plan, jira, phase, no_attendance=False, resume=False,
+               odoo_diff=None, profiler=None):
+    """Make the pending writes of `plan`, return whether all are done
+
+    Writes are checkpointed in the plan as soon as they succeed. When
+    resuming, creates already made are looked up in Tempo first.
+    `odoo_diff` is the `(odoo, diff)` of attendances, if already computed.
+    """
+    from wrappers.write_executor import WriteExecutor
+
+    pending = plan.pending_worklogs()
+    if resume and any(kind == 'create' for _op, (kind, _l, _o) in pending):
+        with phase('find creates'):
+            pending = skip_made_creates(plan, jira, pending)
+
+    writer = WriteExecutor(
+        max_workers=int(config.get('tempo_workers', 4))
+    )
+    for _operation, (kind, log, old_log) in pending:
+        if kind == 'create':
+            writer.add('create', log.description, jira.create_worklog, log)
+        elif kind == 'update':
+            writer.add('update', log.description,
+                       jira.update_worklog, old_log, log)
+        else:
+            writer.add('delete', log.description, jira.delete_worklog, log)
+
+    def checkpoint(index, result):
+        if not result.ok:
+            return
+        worklog_id = None
+        if result.kind == 'create':
+            try:
+                worklog_id = result.response.json().get('tempoWorklogId')
+            except ValueError:
+                pass
+        plan.checkpoint(pending[index][0], worklog_id)
+
+    with phase('write worklogs'):
+        write_results = writer.run(on_result=checkpoint)
+    WriteExecutor.report(write_results)
+
+    if plan.repair and 'repair' not in plan.done:
+        with phase('repair estimates'):
+            for error in jira.repair_estimates(
+                    plan.repair, max_workers=writer.max_workers):
+                print(error)
+        plan.checkpoint('repair')
+
+    if plan.attendances is not None and 'attendances' not in plan.done \
+            and not no_attendance:
+        if odoo_diff:
+            odoo, diff = odoo_diff
+        else:
+            from wrappers.odoo_client import OdooClient
+            with phase('read attendances'):
+                odoo = OdooClient(config, profiler=profiler)
+                diff = odoo.diff_attendances(DateWindow(*plan.date_window),
+                                             plan.attendances)
+        with phase('write attendances'):
+            if not odoo.apply_attendance_diff(diff):
+                plan.checkpoint('attendances')
+        print()
+        print("Odoo attendances: {} created, {} updated, {} removed, "
+              "{} unchanged".format(len(diff.to_create), len(diff.to_write),
+                                    len(diff.to_unlink), len(diff.unchanged)))
 
-    parser.add_argument('-c', '--config',
-                        default=DEFAULT_CONFIG_PATH, type=str)
+    if not plan.is_done():
+        print()
+        print("Some writes failed, run with --resume to retry them.")
+    return plan.is_done()
+
+
+def apply_saved_plan(config, args, profiler=None):
+    """Apply the plan given with `--apply` or left by an interrupted run"""
+    no_attendance = args.no_attendance or config.get('no_attendance')
+    phase = profiler.phase if profiler else lambda name: nullcontext()
+    path = args.apply or SyncPlan.default_path(profile_name(config))
+    if not pathlib.Path(path).exists():
+        if args.apply:
+            raise Exception("Plan file %s does not exist." % path)
+        raise Exception("There is no interrupted synchronization to resume.")
+    plan = SyncPlan.load(path)
+    if plan.profile != profile_name(config):
+        raise Exception("Plan %s was made for another account: %s." % (
+            path, plan.profile))
+
+    if plan.is_done():
+        print()
+        print('All done, nothing to do.')
+        return 0
+    pending = plan.pending_worklogs()
+    Utils.report(
+        [log for _op, (kind, log, _old) in pending if kind == 'create'],
+        [(old, log) for _op, (kind, log, old) in pending if kind == 'update'],
+        [log for _op, (kind, log, _old) in pending if kind == 'delete'],
+        {},
+        None if no_attendance or 'attendances' in plan.done
+        else plan.attendances,
+    )
+    if not args.no_interactive and not Utils.ask_confirmation():
+        return 0
+
+    from wrappers.jira_client import JiraClient
+
+    with phase('connect'):
+        jira = JiraClient(config, profiler=profiler)
+    done = apply_plan(config, plan, jira, phase, no_attendance=no_attendance,
+                      resume=True, profiler=profiler)
+    if done and not args.apply:
+        plan.remove()
+    return 1 if plan.pending_worklogs() else 0
+
+
+def sync(config, args, profiler=None, clients=None):
+    """Synchronize the configured date windows, return the exit status
+
+    With a `profiler`, sessions are instrumented and phases timed.
+    Jira and Odoo clients are kept in `clients` to be reused by the next
+    synchronizations.
+    """
+    clients = {} if clients is None else clients
+    exit_status = 0
+    no_attendance = args.no_attendance or config.get('no_attendance')
+    do_submit = args.submit
+    repair_estimate = args.repair_estimate
+    phase = profiler.phase if profiler else lambda name: nullcontext()
+    date_windows = config['date_windows']
+    # weeks to synchronize, narrowed to the changed ones by the journal
+    sync_windows = date_windows
+    sync_window = config['date_window']
+
+    from concurrent.futures import ThreadPoolExecutor
+    from wrappers.jira_client import JiraClient
+    from wrappers.write_executor import WriteExecutor
+
+    journal = None
+    if not config.get('no_sync_journal'):
+        from wrappers.sync_journal import SyncJournal
+        journal = SyncJournal(profile_name(config))
+    # week -> fingerprint of its gtimelog entries, computed once parsed
+    local_fingerprint = {}
+
+    def timelog(window):
+        """Parsed entries of `window`"""
+        attendances, gt_logs = parsed.result()
+        start, stop = (day.date() for day in window)
+        return (
+            [attendance for attendance in attendances
+             if start <= attendance[0].date() <= stop],
+            [log for log in gt_logs if start <= log.date <= stop],
+        )
+
+    def fetch_worklogs(window):
+        with phase('fetch worklogs'):
+            jira_logs = list(jira.get_worklogs(window))
+        with phase('resolve worklogs'):
+            return jira.populate_issue_field(jira_logs)
+
+    def parse_timelog():
+        with phase('parse timelog'):
+            from wrappers.gtimelog_parser import GtimelogParser
+            gt_parser = GtimelogParser(config)
+            attendances, gt_logs = gt_parser.get_entries(config['date_window'])
+        if journal:
+            local_fingerprint.update(local_fingerprints(
+                config, gt_logs, attendances, no_attendance
+            ))
+        return attendances, gt_logs
+
+    def resolve_timelog(window):
+        _attendances, gt_logs = timelog(window)
+        with phase('resolve timelog'):
+            gt_logs, gt_errors = jira.populate_issue_field(gt_logs)
+        # Aggregate once resolved, aliases and key case are normalized
+        return aggregate_logs(gt_logs, config['aggregate']), gt_errors
+
+    def read_attendances(window):
+        attendances, _gt_logs = timelog(window)
+        with phase('read attendances'):
+            from wrappers.odoo_client import OdooClient
+            odoo = clients.get('odoo') or OdooClient(config, profiler=profiler)
+            clients['odoo'] = odoo
+            return odoo, odoo.diff_attendances(window,
+                                               attendances)
+
+    def get_timesheet_state(window):
+        with phase('timesheet state'):
+            return jira.get_timesheet_state(window)
+
+    # Nothing depends on each other until the diff: run the Tempo fetch,
+    # the timelog parsing, issue resolutions, timesheet states and Odoo
+    # reads at the same time. Tasks only wait for tasks submitted before
+    # them, so a single worker runs them one after the other.
+    workers = 1 if args.sequential else 5
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        parsed = pool.submit(parse_timelog)
+        with phase('connect'):
+            jira = clients.get('jira') or JiraClient(config, profiler=profiler)
+            clients['jira'] = jira
+        timesheet_states = {}
+        if do_submit:
+            timesheet_states = {
+                window: pool.submit(get_timesheet_state, window)
+                for window in date_windows
+            }
+        changed = date_windows
+        # only wait for the timelog when weeks may be skipped, the Tempo
+        # fetch runs along with the parsing otherwise
+        if journal and not args.force and any(
+                journal.get(window.start.isoformat())
+                for window in date_windows):
+            parsed.result()
+            with phase('check journal'):
+                unchanged = unchanged_weeks(journal, jira, date_windows,
+                                            local_fingerprint)
+            changed = [window for window in date_windows
+                       if window not in unchanged]
+            if changed:
+                # weeks in between changed ones are synchronized as well
+                first = date_windows.index(changed[0])
+                last = date_windows.index(changed[-1])
+                sync_windows = date_windows[first:last + 1]
+                sync_window = DateWindow(changed[0].start, changed[-1].stop)
+        if changed:
+            remote = pool.submit(fetch_worklogs, sync_window)
+            local = pool.submit(resolve_timelog, sync_window)
+            if not no_attendance:
+                odoo_attendances = pool.submit(read_attendances, sync_window)
+            attendances, _gt_logs = timelog(sync_window)
+            jira_logs, jira_errors = remote.result()
+            gt_logs, gt_errors = local.result()
+
+    if changed:
+        with phase('diff'):
+            weeks = reconcile_weeks(
+                sync_windows, jira_logs, gt_logs, gt_errors,
+                attendances
+            )
+    else:
+        weeks, gt_errors = [], {}
+    for week in weeks:
+        if len(weeks) > 1:
+            Utils.report_week_header(week.window)
+        Utils.report(week.to_create, week.to_update, week.to_delete,
+                     week.to_check,
+                     week.attendances if not no_attendance else None)
+
+    to_create = [log for week in weeks for log in week.to_create]
+    to_update = [pair for week in weeks for pair in week.to_update]
+    to_delete = [log for week in weeks for log in week.to_delete]
+
+    nothing_to_do = False
+    if not gt_errors and not to_delete and not to_create and not to_update:
+        nothing_to_do = True
+        print()
+        print('All done, nothing to do.')
+        if not changed:
+            print('Nothing changed since the last synchronization, '
+                  'use --force to compare anyway.')
+
+    def new_plan(path):
+        plan = SyncPlan(
+            path,
+            profile_name(config),
+            sync_window,
+            worklogs=build_plan_worklogs(weeks),
+            attendances=None if no_attendance else attendances,
+            known_worklogs=[log.worklog_id for log in jira_logs] + [
+                log.worklog_id for logs in jira_errors.values() for log in logs
+            ],
+        )
+        if repair_estimate:
+            # Get a unique list of all the issues impacted
+            plan.repair = sorted({log.issue for _k, log, _o in plan.worklogs})
+        return plan
+
+    if args.plan_out:
+        if changed:
+            new_plan(args.plan_out).save()
+            print()
+            print("Plan saved, apply it with --apply {}".format(args.plan_out))
+        return exit_status
+
+    confirmed = False
+    if not nothing_to_do and not args.no_interactive:
+        confirmed = Utils.ask_confirmation()
+
+    # weeks are recorded in the journal once in sync
+    in_sync = nothing_to_do
+    # whether Tempo worklogs were written since they were fetched
+    wrote = False
+    if changed and (args.no_interactive or confirmed):
+        # saved first, so an interrupted run can be resumed
+        plan = new_plan(SyncPlan.default_path(profile_name(config)))
+        plan.save()
+        wrote = bool(plan.worklogs)
+        in_sync = apply_plan(
+            config, plan, jira, phase, no_attendance=no_attendance,
+            odoo_diff=None if no_attendance else odoo_attendances.result(),
+        )
+        if in_sync:
+            plan.remove()
+        if plan.pending_worklogs():
+            exit_status = 1
+    elif changed and nothing_to_do and not no_attendance:
+        # attendances are only written along with worklogs
+        _odoo, diff = odoo_attendances.result()
+        in_sync = not (diff.to_create or diff.to_write or diff.to_unlink)
+
+    if journal and changed and in_sync:
+        with phase('record journal'):
+            if wrote:
+                versions = jira.get_worklog_versions(sync_window)
+            else:
+                # Tempo is as fetched, no need to fetch it again
+                versions = [
+                    (log.worklog_id, log.date, log.updated_at)
+                    for log in jira_logs + [
+                        log for logs in jira_errors.values() for log in logs
+                    ]
+                ]
+            remote_fingerprint = remote_fingerprints(
+                sync_windows, versions
+            )
+            for week in weeks:
+                # unresolved entries are reported until they are fixed
+                if not week.to_check:
+                    journal.record(week.window.start.isoformat(),
+                                   local_fingerprint[week.window],
+                                   remote_fingerprint[week.window])
+
+    reviewer = None
+    for window in date_windows:
+        submit = False
+        if do_submit and timesheet_states[window].result() == "OPEN":
+            if len(date_windows) > 1:
+                Utils.report_week_header(window)
+            submit = Utils.ask_submit_timesheet()
+        if submit:
+            cfg_reviewer_key = "tempo_reviewer_id"
+            select_reviewer = args.select_reviewer
+            if reviewer is None:
+                reviewer = config.get(cfg_reviewer_key)
+                if not reviewer or select_reviewer:
+                    reviewers = jira.get_reviewers()
+                    selected = Utils.select_reviewer(reviewers)
+                    reviewer = selected.get("accountId")
+                    print()
+                    print("Please add following line to your gtimelogrc (in gtimelog_exporter section) to avoid having to select a reviewer the next time:\n")
+                    print(f"{cfg_reviewer_key} = {reviewer}")
+            comment = Utils.request_comment()
+            res = jira.submit_timesheet(window, reviewer, comment=comment)
+            if res:
+                print("Your Timesheet was submitted successfully")
+
+    return exit_status
+
+
+def watch(config, args):
+    """Synchronize the timelog each time it changed, until interrupted
+
+    Once the selected weeks are synchronized, only the days of the lines
+    appended to the timelog are, reusing the same Jira and Odoo clients.
+    Rejected Jira or Tempo credentials stop the watch, other errors are
+    retried with the next changes.
+    """
+    from wrappers.gtimelog_parser import GtimelogParser
+    from wrappers.jira_client import JiraAuthError
+    from wrappers.timelog_index import TimelogIndex
+    from wrappers.watcher import TimelogWatcher
+
+    timelog_file = GtimelogParser(config).timelog_file
+    index = TimelogIndex(timelog_file)
+    try:
+        index.update()
+    except OSError:
+        pass
+    watcher = TimelogWatcher(
+        timelog_file,
+        debounce=float(config.get('watch_debounce', 5)),
+        interval=float(config.get('watch_interval', 5)),
+    )
+    clients = {}
+    sync_config = config
+    while True:
+        try:
+            if sync(sync_config, args, clients=clients):
+                print("Some writes failed, they will be retried with the "
+                      "next changes.")
+        except JiraAuthError:
+            # retrying would not help, and may lock the account
+            raise
+        except Exception as e:
+            print(e)
+            # sessions may have expired
+            clients.clear()
+        print()
+        print("{:%H:%M:%S} Watching {} ({})".format(
+            datetime.now(), timelog_file,
+            'inotify' if watcher.inotify else 'polling'))
+        while True:
+            watcher.wait()
+            offset = index.size
+            try:
+                if index.update():
+                    break
+            except OSError:
+                # being replaced
+                pass
+        sync_config = config
+        if index.sorted and index.scanned_from:
+            first_day = index.day_at(offset) or index.day_at(index.size)
+            last_day = index.day_at(index.size)
+            windows = [
+                DateWindow(max(window.start,
+                               datetime.combine(first_day, time())),
+                           min(window.stop,
+                               datetime.combine(last_day, time())
+                               + timedelta(hours=23, minutes=59, seconds=59)))
+                for window in Utils.week_windows(first_day, last_day)
+            ]
+            sync_config = dict(
+                config,
+                date_windows=windows,
+                date_window=DateWindow(windows[0].start, windows[-1].stop),
+                # the journal is about whole weeks
+                no_sync_journal=1,
+            )
+        print()
+        print("{:%H:%M:%S} Synchronizing {} → {}".format(
+            datetime.now(), sync_config['date_window'].start.date(),
+            sync_config['date_window'].stop.date()))
+
+
+def add_sync_arguments(parser):
+    """Synchronization options, shared with batch.py"""
     parser.add_argument('-w', '--week',
                         default=Utils.current_weeknumber(), type=int)
     parser.add_argument('-y', '--year',
                         default=Utils.current_year(), type=int)
-    parser.add_argument('--no-interactive', action='store_true')
+    parser.add_argument('--weeks', default=1, type=int,
+                        help='Number of weeks to synchronize, '
+                             'ending with the selected week')
+    parser.add_argument('--from', dest='date_from', type=Utils.parse_date,
+                        help='First day to synchronize (YYYY-MM-DD), '
+                             'extended to the whole week, '
+                             'defaults to --to')
+    parser.add_argument('--to', dest='date_to', type=Utils.parse_date,
+                        help='Last day to synchronize (YYYY-MM-DD), '
+                             'extended to the whole week, '
+                             'defaults to --from')
     parser.add_argument('--no-attendance', action='store_true')
-    parser.add_argument('--submit', action='store_true')
-    parser.add_argument('--select-reviewer', default=False, action='store_true')
     parser.add_argument('-r', '--repair-estimate',
                         default=False,
                         action='store_true',
                         help='The script will attempt to update the "Remaining Estimate", default is False')
+    parser.add_argument('--aggregate', choices=AGGREGATE_MODES,
+                        help='Merge entries of the same issue and day having '
+                             'the same description, or all of them '
+                             '(default: aggregate option of the config, '
+                             'none)')
+    parser.add_argument('--force', action='store_true',
+                        help='Compare weeks which did not change since '
+                             'their last synchronization')
+    parser.add_argument('--sequential', action='store_true',
+                        help='Fetch, parse and resolve one after the other '
+                             'instead of concurrently')
+
+
+def check_not_before(config):
+    not_before = datetime.strptime('2019-04-01', '%Y-%M-%d').date()
+    if config['date_window'].start.date() < not_before:
+        raise Exception('This script is not intended to manage attendences '
+                        'prior to April 1st, 2019')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="gtimelog_exporter options")
+
+    parser.add_argument('-c', '--config',
+                        default=DEFAULT_CONFIG_PATH, type=str)
+    add_sync_arguments(parser)
+    parser.add_argument('--no-interactive', action='store_true')
+    parser.add_argument('--submit', action='store_true')
+    parser.add_argument('--select-reviewer', default=False, action='store_true')
+    parser.add_argument('--plan-out', metavar='PLAN_FILE',
+                        help='Save the writes to make in a plan file '
+                             'instead of making them')
+    parser.add_argument('--apply', metavar='PLAN_FILE',
+                        help='Make the writes of a plan file saved with '
+                             '--plan-out, skipping the ones already made')
+    parser.add_argument('--resume', action='store_true',
+                        help='Make the writes left by an interrupted run')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and synchronize the days logged '
+                             'each time the timelog changes')
+    parser.add_argument('--profile', nargs='?', const='-', metavar='JSON_FILE',
+                        help='Print the time spent in each phase and the '
+                             'calls made to each endpoint, or save it '
+                             'as JSON')
 
     args = parser.parse_args()
+    if args.watch:
+        if args.apply or args.resume or args.plan_out or args.submit:
+            parser.error('--watch cannot be used with --apply, --resume, '
+                         '--plan-out or --submit')
+        # nobody to confirm the writes
+        args.no_interactive = True
 
     config = Utils.parse_config(args)
 
     no_attendance = args.no_attendance or config.get('no_attendance')
-    do_submit = args.submit
-    repair_estimate = args.repair_estimate
-
     if no_attendance:
-        odoo_conf = {}
         print()
         print('`--no-attendance` flag is ON -> Skipping Odoo attendances')
         print()
     else:
-        odoo_conf = get_odoo_conf(config)
+        config = get_odoo_conf(config, args)
 
     jira_api_token = env.get('JIRA_API_TOKEN')
     if not jira_api_token:
@@ -251,80 +948,21 @@ if __name__ == '__main__':
 
     config['tempo_api_token'] = tempo_api_token
 
-    not_before = datetime.strptime('2019-04-01', '%Y-%M-%d').date()
-    if config['date_window'].start.date() < not_before:
-        raise Exception('This script is not intended to manage attendences '
-                        'prior to April 1st, 2019')
-
-    jira = JiraClient(config)
-    jira_logs = jira.get_worklogs(config['date_window'])
-    jira_logs, jira_errors = jira.populate_issue_field(jira_logs)
-
-    gt_parser = GtimelogParser(config)
-    attendances, gt_logs = gt_parser.get_entries(config['date_window'])
-    gt_logs, gt_errors = jira.populate_issue_field(gt_logs)
-
-    to_create = []
-    to_delete = []
-
-    for log in jira_logs:
-        if log not in gt_logs:
-            to_delete.append(log)
-
-    for log in gt_logs:
-        if log not in jira_logs:
-            to_create.append(log)
-
-    Utils.report(to_create, to_delete, gt_errors, attendances if not no_attendance else None)
-
-    nothing_to_do = False
-    if not gt_errors and not to_delete and not to_create:
-        nothing_to_do = True
-        print()
-        print('All done, nothing to do.')
-
-    confirmed = False
-    if not nothing_to_do:
-        confirmed = Utils.ask_confirmation()
-
-    if args.no_interactive or confirmed:
-        for log in to_create:
-            jira.create_worklog(log)
-
-        for log in to_delete:
-            jira.delete_worklog(log)
-
-        if repair_estimate:
-            # Get a unique list of all the issues impacted
-            to_repair = set([log.issue for log in to_create] + [log.issue for log in to_delete])
-            for i in to_repair:
-                try:
-                    jira.repair_estimate(i)
-                except Exception as e:
-                    print(e)
-
-        if not no_attendance:
-            odoo = OdooClient(odoo_conf)
-            odoo.drop_attendances(config['date_window'])
-            for attendance in attendances:
-                odoo.create_attendance(attendance[0], attendance[1])
-
-    ts_state = jira.get_timesheet_state(config['date_window'])
-    submit = False
-    if ts_state == "OPEN" and do_submit:
-        submit = Utils.ask_submit_timesheet()
-    if submit:
-        cfg_reviewer_key = "tempo_reviewer_id"
-        select_reviewer = args.select_reviewer
-        reviewer = config.get(cfg_reviewer_key)
-        if not reviewer or select_reviewer:
-            reviewers = jira.get_reviewers()
-            selected = Utils.select_reviewer(reviewers)
-            reviewer = selected.get("accountId")
-            print()
-            print("Please add following line to your gtimelogrc (in gtimelog_exporter section) to avoid having to select a reviewer the next time:\n")
-            print(f"{cfg_reviewer_key} = {reviewer}")
-        comment = Utils.request_comment()
-        res = jira.submit_timesheet(config['date_window'], reviewer, comment=comment)
-        if res:
-            print("Your Timesheet was submitted successfully")
+    check_not_before(config)
+
+    profiler = None
+    if args.profile:
+        from wrappers.profiling import Profiler
+        profiler = Profiler()
+    if args.watch:
+        try:
+            watch(config, args)
+        except KeyboardInterrupt:
+            exit_status = 0
+    elif args.apply or args.resume:
+        exit_status = apply_saved_plan(config, args, profiler=profiler)
+    else:
+        exit_status = sync(config, args, profiler=profiler)
+    if profiler:
+        profiler.report(args.profile if args.profile != '-' else None)
+    sys.exit(exit_status)
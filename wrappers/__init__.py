@@ -1,4 +1,2 @@
-from . import multi_log
-from . import jira_client
-from . import gtimelog_parser
-from . import odoo_client
+# Backends are imported by their users, so that a missing or slow
+# dependency (odoorpc, gtimelog) only matters when it is needed.
@@ -0,0 +1,35 @@
+from .multi_log import MultiLog
+
+AGGREGATE_MODES = ('none', 'description', 'issue')
+
+
+def aggregate_logs(logs, mode):
+    """Merge gtimelog entries logged on the same issue and date
+
+    With `description`, durations of entries having the same description
+    are summed up. With `issue`, all the entries of an issue and date are
+    merged and their distinct descriptions joined. Merged logs keep the
+    position of their first entry.
+    """
+    if mode == 'none':
+        return list(logs)
+    if mode not in AGGREGATE_MODES:
+        raise Exception(
+            "Unknown aggregation %s, use one of: %s."
+            % (mode, ', '.join(AGGREGATE_MODES)))
+    merged = {}
+    for log in logs:
+        key = (log.issue, log.date)
+        if mode == 'description':
+            key += (log.comment,)
+        entry = merged.get(key)
+        if entry is None:
+            merged[key] = [log.id, log.duration, [log.comment]]
+            continue
+        entry[1] += log.duration
+        if log.comment not in entry[2]:
+            entry[2].append(log.comment)
+    return [
+        MultiLog(_id, key[0], duration, key[1], '; '.join(comments))
+        for key, (_id, duration, comments) in merged.items()
+    ]
@@ -0,0 +1,13 @@
+import os
+import pathlib
+
+
+def cache_path(*parts):
+    """Return a path inside the exporter cache directory
+
+    Honour `XDG_CACHE_HOME` and create the parent directories.
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    path = pathlib.Path(base, 'gtimelog2odoo', *parts)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
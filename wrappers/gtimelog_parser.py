@@ -1,72 +1,124 @@
 try:
     from gtimelog.settings import Settings
-    from gtimelog.timelog import TimeLog
+    from gtimelog.timelog import (
+        TimeCollection, TimeLog, TimeWindow, parse_datetime
+    )
 except ImportError:
     print('you have to install gtimelog first (pip install gtimelog)')
     raise
 
 from datetime import date
+from operator import itemgetter
 
 from .multi_log import MultiLog
+from .timelog_index import TimelogIndex
+
+
+def split_standard(entry):
+    """Issue and description of `task: description | comment`"""
+    issue, sep, description = entry.partition('|')[0].partition(':')
+    issue = issue.strip()
+    description = description.strip()
+    if sep and issue and description:
+        return issue, description
+    return None
+
+
+def split_categorized(entry):
+    """Issue and description of `category: task description | comment`,
+    the category being optional"""
+    line = entry.partition('|')[0]
+    _category, sep, task = line.partition(':')
+    if sep:
+        line = task.strip()
+    issue, sep, description = line.partition(' ')
+    issue = issue.strip()
+    description = description.strip()
+    if sep and issue and description:
+        return issue, description
+    return None
+
+
+SKIPPED_ENTRIES = frozenset(('arrive', 'arrived', 'start'))
 
 
 class GtimelogParser(object):
 
     def __init__(self, config):
         self.settings = Settings()
-        self.timelog = TimeLog(self.settings.get_timelog_file(),
-                               self.settings.virtual_midnight)
-        self.aliases = config.get('aliases', {})
+        self.timelog_file = config.get('timelog_file') \
+            or self.settings.get_timelog_file()
+        self.index = None
+        if not config.get('no_timelog_index'):
+            self.index = TimelogIndex(self.timelog_file)
+        # aliases match whatever the case
+        self.aliases = {
+            alias.strip().lower(): issue
+            for alias, issue in config.get('aliases', {}).items()
+        }
         self.line_format = config.get('line_format', '')
         if self.line_format == 'categorized':
             self.line_format_str = "category: task description | comment"
-            self.delimiter = " "
+            self.split_entry = split_categorized
         else:
             self.line_format_str = "task: description | comment"
-            self.delimiter = ":"
+            self.split_entry = split_standard
 
-    def skip_entry(self, entry):
-        if '**' in entry:
-            return True
-        if entry.strip() in ('arrive', 'arrived', 'start'):
-            return True
-        return False
+    def _read_window(self, date_window):
+        """Read the timelog items of `date_window` only, using the index"""
+        collection = TimeCollection(self.settings.virtual_midnight)
+        for line in self.index.read_lines(date_window.start.date(),
+                                          date_window.stop.date()):
+            # same parsing as gtimelog's TimeLog
+            time, sep, entry = line.partition(': ')
+            if not sep:
+                continue
+            try:
+                time = parse_datetime(time)
+            except ValueError:
+                continue
+            collection.items.append((time, entry.strip()))
+        collection.items.sort(key=itemgetter(0))
+        return TimeWindow(collection, date_window.start, date_window.stop)
+
+    def get_window(self, date_window):
+        if self.index:
+            try:
+                self.index.update()
+            except OSError:
+                # no timelog yet, let gtimelog handle it
+                pass
+            else:
+                if self.index.sorted:
+                    return self._read_window(date_window)
+        timelog = TimeLog(self.timelog_file, self.settings.virtual_midnight)
+        return timelog.window_for(date_window.start, date_window.stop)
 
     def get_entries(self, date_window):
-        window = self.timelog.window_for(date_window.start, date_window.stop)
+        window = self.get_window(date_window)
+        split_entry = self.split_entry
+        aliases = self.aliases
 
         worklogs = []
         attendances = []
+        malformed = []
         for start, stop, duration, tags, entry in window.all_entries():
-            if self.skip_entry(entry):
+            # slacking entries and arrivals
+            if '**' in entry or entry.strip() in SKIPPED_ENTRIES:
                 continue
             if attendances and attendances[-1][1] == start:
                 attendances[-1] = (attendances[-1][0], stop)
             else:
-                attendances += [(start, stop)]
-            # remove comments
-            line = entry.split('|')[0]
-            try:
-                # remove category
-                if self.line_format == 'categorized':
-                    # category is optional
-                    if ':' in line:
-                        line = line.split(':', 1)[1].strip()
-                issue, description = [
-                    x.strip() for x in line.split(self.delimiter, 1)
-                    if x.strip()
-                ]
-            except ValueError:
-                print(
-                    'Entry must be in the format `{}`. '
-                    'Got '.format(self.line_format_str), entry
-                )
+                attendances.append((start, stop))
+            parts = split_entry(entry)
+            if parts is None:
+                malformed.append((start, entry))
                 continue
-
+            issue, description = parts
             # no matter what we find as `issue`:
             # if we have an alias override it takes precedence
-            if issue in self.aliases:
-                issue = self.aliases[issue]
+            if aliases:
+                issue = aliases.get(issue.lower(), issue)
             worklogs.append(MultiLog(
                 None,
                 issue,
@@ -75,6 +127,12 @@ class GtimelogParser(object):
                 description
             ))
 
+        if malformed:
+            print('{} entries are not in the format `{}` and were '
+                  'ignored:'.format(len(malformed), self.line_format_str))
+            for start, entry in malformed:
+                print('  {:%Y-%m-%d %H:%M}: {}'.format(start, entry))
+
         # Dangling attendance for today
         if attendances and attendances[-1][1].date() == date.today():
             attendances[-1] = (attendances[-1][0], None)
@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+import time
+
+from .cache import cache_path
+
+
+class IssueCache(object):
+    """Persistent issue key <-> id mapping, per Jira instance
+
+    An issue id never changes, its key does when the issue is moved to
+    another project: old keys are kept as aliases of the id and the
+    current key is refreshed once `ttl` expired.
+    Failed lookups are remembered for `negative_ttl` only.
+    """
+
+    ttl = 30 * 24 * 3600
+    negative_ttl = 3600
+
+    def __init__(self, jira_url, path=None):
+        self.jira_url = jira_url
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(
+            str(path or cache_path('issues.sqlite')),
+            timeout=30,
+            check_same_thread=False,
+        )
+        with self.db:
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS issues (
+                    jira_url TEXT, id INTEGER, key TEXT, updated REAL,
+                    PRIMARY KEY (jira_url, id)
+                );
+                CREATE TABLE IF NOT EXISTS refs (
+                    jira_url TEXT, ref TEXT, id INTEGER,
+                    PRIMARY KEY (jira_url, ref)
+                );
+                CREATE TABLE IF NOT EXISTS misses (
+                    jira_url TEXT, ref TEXT, reason TEXT, expires REAL,
+                    PRIMARY KEY (jira_url, ref)
+                );
+            """)
+
+    @staticmethod
+    def _ref(ref):
+        return str(ref).upper()
+
+    def get(self, ref):
+        """Return the `(id, key)` of a cached issue or None"""
+        ref = self._ref(ref)
+        if ref.isdigit():
+            query = (
+                "SELECT id, key FROM issues "
+                "WHERE jira_url = ? AND id = ? AND updated > ?"
+            )
+        else:
+            query = (
+                "SELECT issues.id, issues.key FROM refs "
+                "JOIN issues ON issues.jira_url = refs.jira_url "
+                "AND issues.id = refs.id "
+                "WHERE refs.jira_url = ? AND refs.ref = ? "
+                "AND issues.updated > ?"
+            )
+        with self._lock:
+            row = self.db.execute(
+                query, (self.jira_url, ref, time.time() - self.ttl)
+            ).fetchone()
+        return row and (row[0], row[1])
+
+    def get_miss(self, ref):
+        """Return the reason of a recent failed lookup or None"""
+        with self._lock:
+            row = self.db.execute(
+                "SELECT reason FROM misses "
+                "WHERE jira_url = ? AND ref = ? AND expires > ?",
+                (self.jira_url, self._ref(ref), time.time())
+            ).fetchone()
+        return row and row[0]
+
+    def store(self, ref, issue_id, key):
+        refs = {self._ref(key)}
+        if not self._ref(ref).isdigit():
+            # the issue may have been moved, keep the old key as an alias
+            refs.add(self._ref(ref))
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?)",
+                (self.jira_url, issue_id, key, time.time())
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO refs VALUES (?, ?, ?)",
+                [(self.jira_url, r, issue_id) for r in refs]
+            )
+            self.db.executemany(
+                "DELETE FROM misses WHERE jira_url = ? AND ref = ?",
+                [(self.jira_url, r) for r in refs | {str(issue_id)}]
+            )
+
+    def store_miss(self, ref, reason):
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO misses VALUES (?, ?, ?, ?)",
+                (self.jira_url, self._ref(ref), reason,
+                 time.time() + self.negative_ttl)
+            )
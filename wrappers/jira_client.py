@@ -1,14 +1,43 @@
-import requests
+from requests import RequestException
 from requests.auth import HTTPBasicAuth
 from urllib.parse import urljoin
 
-from dateutil import parser
 from collections import defaultdict
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
 
+from .issue_cache import IssueCache
 from .multi_log import MultiLog
+from .profile_cache import ProfileCache
+from .transport import new_adapter, new_session, timeout_from_config
+
+
+class JiraAuthError(Exception):
+    """Jira or Tempo rejected the credentials"""
+
+
+class JiraSearchError(Exception):
+    """A JQL search failed with `status_code`
+
+    Jira answers 400 to invalid queries: issues can still be fetched one
+    by one then. Rate limits and server errors were already retried.
+    """
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
 
 
 class JiraClient(object):
+    # Number of refs per JQL search, also used as the page size
+    search_page_size = 100
+    # Tempo accepts up to 5000 worklogs per page
+    worklog_page_size = 1000
+    # Jira accepts up to 90 account ids per bulk user request
+    user_bulk_size = 90
+    # Reviewer names are fetched again after a day
+    reviewer_names_max_age = 24 * 3600
+
     @staticmethod
     def convert_seconds_to_jira_time(seconds):
         weeks, remainder = divmod(seconds, 5 * 8 * 3600)
@@ -28,7 +57,7 @@ class JiraClient(object):
 
         return " ".join(jira_time) if jira_time else "0s"
 
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, profiler=None):
         # Ensure the url ends with a slash otherwise the urljoin will mess up
         # (in case you forget to read the docs and you don't put the slash in the config ;P)
         self.jira_url = config.get('jira_url', '').rstrip("/") + "/"
@@ -36,6 +65,21 @@ class JiraClient(object):
         self.jira_api_token = config.get('jira_api_token')
         self.tempo_api_token = config.get('tempo_api_token')
         self.jira_account_email = config.get('jira_account_email')
+        self.profiler = profiler
+        # connection pools shared with other clients in batch mode, else
+        # sized for the concurrent Tempo writes and the Jira sessions
+        self.http_adapter = config.get('http_adapter') or new_adapter(
+            pool_maxsize=max(10, int(config.get('tempo_workers', 4)) * 2),
+            retries=int(config.get('http_retries', 3)),
+        )
+        self.http_timeout = timeout_from_config(config)
+        self.profile_cache = None
+        if not config.get('no_profile_cache'):
+            self.profile_cache = ProfileCache(
+                self.jira_url, self.jira_account_email)
+        self.issue_cache = None
+        if not config.get('no_issue_cache'):
+            self.issue_cache = IssueCache(self.jira_url)
         self.jira_session, self.account_id = self.init_jira_session()
         self.tempo_session = self.init_tempo_session()
         self.worklog_url = urljoin(self.tempo_url, f'worklogs/user/{self.account_id}')
@@ -44,8 +88,14 @@ class JiraClient(object):
         self.timesheet_state_url = urljoin(self.tempo_url, f"timesheet-approvals/user/{self.account_id}")
         self.timesheet_submit_url = urljoin(self.tempo_url, f'timesheet-approvals/user/{self.account_id}/submit')
 
+    def _new_session(self):
+        session = new_session(self.http_adapter, self.http_timeout)
+        if self.profiler:
+            self.profiler.instrument_session(session)
+        return session
+
     def init_jira_session(self):
-        session = requests.Session()
+        session = self._new_session()
         session.headers.update({
             "Accept": "application/json",
         })
@@ -53,13 +103,25 @@ class JiraClient(object):
             self.jira_account_email,
             self.jira_api_token
         )
+        account_id = self.profile_cache and self.profile_cache.get(
+            'account_id')
+        if account_id:
+            # Credentials will be checked by the first real request
+            session.hooks['response'].append(self._check_jira_auth)
+            return session, account_id
+        return session, self._get_account_id(session)
+
+    def _get_account_id(self, session):
         resp = session.get(urljoin(self.jira_url, 'rest/api/3/myself'))
         if resp.status_code == 200:
-            return session, resp.json()["accountId"]
+            account_id = resp.json()["accountId"]
+            if self.profile_cache:
+                self.profile_cache.set('account_id', account_id)
+            return account_id
         elif resp.status_code == 401:
-            raise Exception("Error: Jira authentication failed.")
+            raise JiraAuthError("Error: Jira authentication failed.")
         elif resp.status_code == 403:
-            raise Exception(
+            raise JiraAuthError(
                 "Jira credentials seems to be correct, but this user does "
                 "not have permission to log in.\nTry to log in via browser, "
                 "maybe you need to answer a security question: %s" %
@@ -71,12 +133,33 @@ class JiraClient(object):
                 " Jira gave %s status code." % resp.status_code
             )
 
+    def _check_jira_auth(self, response, *args, **kwargs):
+        if response.status_code != 401:
+            return None
+        self.profile_cache.clear()
+        session = self.jira_session
+        try:
+            session.hooks['response'].remove(self._check_jira_auth)
+        except ValueError:
+            # already removed by a concurrent request
+            pass
+        # Raises the detailed error unless the credentials are fine now
+        self._get_account_id(session)
+        # they are: send the request again, its answer replaces this one
+        return session.send(response.request, **kwargs)
+
+    @staticmethod
+    def _check_tempo_auth(response, *args, **kwargs):
+        if response.status_code == 401:
+            raise JiraAuthError("Error: Tempo authentication failed.")
+
     def init_tempo_session(self):
-        session = requests.Session()
+        session = self._new_session()
         session.headers.update({
             "Accept": "application/json",
             "Authorization": f"Bearer {self.tempo_api_token}"
         })
+        session.hooks['response'].append(self._check_tempo_auth)
         return session
 
     def get_issue(self, issue, fields="*all"):
@@ -89,43 +172,83 @@ class JiraClient(object):
             "to": date_window.stop.date().isoformat(),
         }
 
+    def _get_worklog_page(self, url, params=None):
+        response = self.tempo_session.get(url, params=params)
+        if response.status_code == 200:
+            return response.json()
+        raise Exception(
+            'Error when requesting Jira: {code} {error}'.format(
+                code=response.status_code,
+                error=response.text
+            ))
+
+    @staticmethod
+    def parse_date(value):
+        """Decode the `YYYY-MM-DD` dates of Tempo, with dateutil as a
+        fallback for any other format"""
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            from dateutil import parser
+            return parser.parse(value).date()
+
+    @classmethod
+    def worklog_from_tempo(cls, entry):
+        return MultiLog(
+            entry['issue']['id'],
+            None,  # Populated later
+            entry['timeSpentSeconds'],
+            cls.parse_date(entry['startDate']),
+            entry['description'],
+            worklog_id=entry['tempoWorklogId'],
+            updated_at=entry.get('updatedAt'),
+        )
+
     def get_worklogs(self, date_window):
-        url = self.worklog_url
+        """Iterate over the Tempo worklogs of the user in `date_window`
+
+        Pages are followed through `metadata.next`, one after the other.
+        """
         params = self._prepare_params_from_date_window(date_window)
         params.update(
             {
                 "offset": 0,
-                "limit": 9999,
+                "limit": self.worklog_page_size,
             }
         )
-        response = self.tempo_session.get(
-            url,
-            params=params
-        )
-        if response.status_code == 200:
-            entries = response.json()["results"]
-            worklogs = []
-            for entry in entries:
-                worklogs.append(
-                    MultiLog(
-                        entry['issue']['id'],
-                        None,  # Populated later
-                        entry['timeSpentSeconds'],
-                        parser.parse(entry['startDate']).date(),
-                        entry['description']
-                    )
-                )
-
-            return worklogs
-        else:
-            raise Exception(
-                'Error when requesting Jira: {code} {error}'.format(
-                    code=response.status_code,
-                    error=response.text
-                ))
+        data = self._get_worklog_page(self.worklog_url, params)
+        while True:
+            for entry in data["results"]:
+                yield self.worklog_from_tempo(entry)
+            next_url = data.get("metadata", {}).get("next")
+            if not next_url:
+                return
+            data = self._get_worklog_page(next_url)
 
-    def create_worklog(self, worklog):
-        values = {
+    def get_worklog_versions(self, date_window):
+        """Return the `(tempoWorklogId, date, updatedAt)` of the worklogs
+
+        Used to tell whether worklogs in `date_window` changed, without
+        building nor resolving them.
+        """
+        params = self._prepare_params_from_date_window(date_window)
+        params.update({"offset": 0, "limit": self.worklog_page_size})
+        versions = []
+        data = self._get_worklog_page(self.worklog_url, params)
+        while True:
+            versions += [
+                (entry['tempoWorklogId'],
+                 self.parse_date(entry['startDate']),
+                 entry.get('updatedAt'))
+                for entry in data["results"]
+            ]
+            next_url = data.get("metadata", {}).get("next")
+            if not next_url:
+                return versions
+            data = self._get_worklog_page(next_url)
+
+    def _worklog_values(self, worklog):
+        return {
             "issueId": worklog.id,
             "authorAccountId": self.account_id,
             "description": worklog.comment,
@@ -134,66 +257,238 @@ class JiraClient(object):
             "timeSpentSeconds": worklog.duration
         }
 
+    def create_worklog(self, worklog):
         return self.tempo_session.post(
             self.worklog_create_url,
-            json=values,
+            json=self._worklog_values(worklog),
+        )
+
+    def update_worklog(self, old_worklog, new_worklog):
+        """Replace the Tempo worklog of `old_worklog` by `new_worklog`"""
+        url = urljoin(self.tempo_url, f'worklogs/{old_worklog.worklog_id}')
+        return self.tempo_session.put(
+            url,
+            json=self._worklog_values(new_worklog),
         )
 
     def delete_worklog(self, worklog):
-        url = urljoin(self.worklog_url, worklog.id)
+        url = urljoin(self.tempo_url, f'worklogs/{worklog.worklog_id}')
         return self.tempo_session.delete(url)
 
+    def search_issues(self, jql, fields="id,key"):
+        """Iterate over the issues matching `jql`, following pagination"""
+        url = urljoin(self.jira_url, 'rest/api/3/search')
+        start_at = 0
+        while True:
+            response = self.jira_session.get(url, params={
+                "jql": jql,
+                "fields": fields,
+                "startAt": start_at,
+                "maxResults": self.search_page_size,
+                # unknown keys are reported as warnings instead of failing
+                # the whole query
+                "validateQuery": "warn",
+            })
+            if response.status_code != 200:
+                raise JiraSearchError(
+                    'Error when searching Jira: {code} {error}'.format(
+                        code=response.status_code,
+                        error=response.text
+                    ), response.status_code)
+            data = response.json()
+            issues = data.get("issues", [])
+            yield from issues
+            start_at += len(issues)
+            if not issues or start_at >= data.get("total", 0):
+                break
+
+    @staticmethod
+    def _ref_key(ref):
+        # ids are compared as strings, keys are case insensitive in Jira
+        return str(ref).upper()
+
+    def _jql_in(self, field, values):
+        """`field in (...)` JQL queries, one per `search_page_size` values"""
+        step = self.search_page_size
+        for i in range(0, len(values), step):
+            yield '{} in ({})'.format(field, ", ".join(
+                '"{}"'.format(value.replace('"', '\\"'))
+                for value in values[i:i + step]
+            ))
+
+    def resolve_issues(self, refs):
+        """Resolve issue ids and keys in bulk
+
+        Return a dict mapping each ref found to an `(id, key)` tuple.
+        Refs Jira did not return are missing from the result.
+        """
+        refs = list({self._ref_key(ref): ref for ref in refs}.values())
+        ids = [str(ref) for ref in refs if str(ref).isdigit()]
+        keys = [ref for ref in refs if not str(ref).isdigit()]
+        found = {}
+        for field, values in (("id", ids), ("key", keys)):
+            for jql in self._jql_in(field, values):
+                try:
+                    for issue in self.search_issues(jql):
+                        found[issue["id"]] = (int(issue["id"]), issue["key"])
+                        found[self._ref_key(issue["key"])] = found[issue["id"]]
+                except JiraSearchError as e:
+                    if e.status_code != 400:
+                        raise
+                    # Invalid query, per-issue lookups will take over
+                    print(e)
+        return {
+            ref: found[self._ref_key(ref)]
+            for ref in refs if self._ref_key(ref) in found
+        }
+
     def populate_issue_field(self, logs):
-        new_logs = []
-        errors = defaultdict(list)
-        for log in logs:
-            res = self.get_issue(log.jira_ref, "id,key")
+        logs = list(logs)
+        refs = {log.jira_ref for log in logs}
+        resolved = {}
+        failed = {}
+        if self.issue_cache:
+            for ref in refs:
+                cached = self.issue_cache.get(ref)
+                if cached:
+                    resolved[ref] = cached
+                    continue
+                reason = self.issue_cache.get_miss(ref)
+                if reason:
+                    failed[ref] = reason
+        fetched = self.resolve_issues(refs - set(resolved) - set(failed))
+        for ref in refs - set(resolved) - set(failed) - set(fetched):
+            # Not returned by the search (moved issue, no permission...)
+            # ask for it directly to get the reason
+            res = self.get_issue(ref, "id,key")
             if res.status_code == 200:
                 data = res.json()
-                # Ensure both keys are properly set
-                # as this log entry can come from gtimelog (no id)
-                # or from tempo api (no key)
-                log.id = data["id"]
-                log.issue = data["key"]
-                new_logs.append(log)
+                fetched[ref] = (int(data["id"]), data["key"])
             else:
-                errors[res.reason].append(log)
+                failed[ref] = res.reason
+                # only remember missing issues, not server side, rate
+                # limit or credentials errors
+                if self.issue_cache and res.status_code in (400, 404):
+                    self.issue_cache.store_miss(ref, res.reason)
+        if self.issue_cache:
+            for ref, (issue_id, key) in fetched.items():
+                self.issue_cache.store(ref, issue_id, key)
+        resolved.update(fetched)
+
+        new_logs = []
+        errors = defaultdict(list)
+        for log in logs:
+            if log.jira_ref in failed:
+                errors[failed[log.jira_ref]].append(log)
+                continue
+            # Ensure both keys are properly set
+            # as this log entry can come from gtimelog (no id)
+            # or from tempo api (no key)
+            log.id, log.issue = resolved[log.jira_ref]
+            new_logs.append(log)
 
         return new_logs, errors
 
-    def repair_estimate(self, issue):
-        response = self.get_issue(issue)
-        if not response.ok:
-            raise Exception(f"Cannot fetch information for issue: {issue}")
-        try:
-            timetracking = response.json()['fields']['timetracking']
-            original_estimate_s = timetracking['originalEstimateSeconds']
-            original_estimate = timetracking['originalEstimate']
-            timespent_s = timetracking['timeSpentSeconds']
-            diff_o_e_vs_t_s = original_estimate_s - timespent_s
-            remaining_estimate_s = diff_o_e_vs_t_s if diff_o_e_vs_t_s >= 0 else 0
-
-            payload = {
-                "fields": {
-                    "timetracking": {
-                        "originalEstimate": original_estimate,
-                        "originalEstimateSeconds" : original_estimate_s,
-                        "remainingEstimateSeconds": remaining_estimate_s,
-                        "remainingEstimate": self.convert_seconds_to_jira_time(remaining_estimate_s),
-                    }
+    @classmethod
+    def _estimate_payload(cls, timetracking):
+        """Update setting the remaining estimate to the original estimate
+        minus the time spent, None if it is already the case"""
+        original_estimate_s = timetracking['originalEstimateSeconds']
+        original_estimate = timetracking['originalEstimate']
+        timespent_s = timetracking.get('timeSpentSeconds', 0)
+        diff_o_e_vs_t_s = original_estimate_s - timespent_s
+        remaining_estimate_s = diff_o_e_vs_t_s if diff_o_e_vs_t_s >= 0 else 0
+        if timetracking.get('remainingEstimateSeconds') == remaining_estimate_s:
+            return None
+        return {
+            "fields": {
+                "timetracking": {
+                    "originalEstimate": original_estimate,
+                    "originalEstimateSeconds": original_estimate_s,
+                    "remainingEstimateSeconds": remaining_estimate_s,
+                    "remainingEstimate": cls.convert_seconds_to_jira_time(remaining_estimate_s),
                 }
             }
-            url = urljoin(self.jira_url, f"/rest/api/latest/issue/{issue}")
-            put_response = self.jira_session.put(url, json=payload)
-        except KeyError as e:
-            raise Exception(f"repair_estimate: impossible to edit remaining estimate for {issue}. Check permissions and jira workflow. Maybe the `originalEstimate` field is not editable.")
+        }
+
+    def repair_estimates(self, issues, max_workers=4):
+        """Repair the remaining estimate of `issues`, given by key
+
+        Time tracking is read with JQL searches restricted to this field,
+        issues whose remaining estimate is right are skipped and the others
+        updated concurrently. Return the error messages.
+        """
+        keys = list({self._ref_key(issue): issue for issue in issues}.values())
+        timetrackings = {}
+        errors = []
+        for jql in self._jql_in("key", keys):
+            try:
+                for issue in self.search_issues(jql, fields="timetracking"):
+                    timetrackings[self._ref_key(issue["key"])] = \
+                        issue["fields"].get("timetracking") or {}
+            except (JiraSearchError, RequestException) as e:
+                errors.append(str(e))
+        payloads = {}
+        for issue in keys:
+            timetracking = timetrackings.get(self._ref_key(issue))
+            if timetracking is None:
+                errors.append(f"Cannot fetch information for issue: {issue}")
+                continue
+            try:
+                payload = self._estimate_payload(timetracking)
+            except KeyError:
+                errors.append(f"repair_estimate: impossible to edit remaining estimate for {issue}. Check permissions and jira workflow. Maybe the `originalEstimate` field is not editable.")
+                continue
+            if payload:
+                payloads[issue] = payload
+
+        def update(issue):
+            url = urljoin(self.jira_url, f"rest/api/latest/issue/{issue}")
+            response = self.jira_session.put(url, json=payloads[issue])
+            if not response.ok:
+                return (f"repair_estimate: cannot update {issue}: "
+                        f"{response.status_code} {response.text}")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            errors += [error for error in pool.map(update, payloads) if error]
+        return errors
+
+    def get_user_names(self, account_ids):
+        """Return the display names of `account_ids`, fetched in bulk"""
+        url = urljoin(self.jira_url, "rest/api/3/user/bulk")
+        step = self.user_bulk_size
+        names = {}
+        for i in range(0, len(account_ids), step):
+            params = {
+                "accountId": account_ids[i:i + step],
+                "startAt": 0,
+                "maxResults": step,
+            }
+            while True:
+                response = self.jira_session.get(url, params=params)
+                response.raise_for_status()
+                data = response.json()
+                for user in data["values"]:
+                    names[user["accountId"]] = user["displayName"]
+                if data.get("isLast", True) or not data["values"]:
+                    break
+                params["startAt"] += len(data["values"])
+        return names
 
     def get_reviewers(self):
         response = self.tempo_session.get(self.timesheet_get_reviewers_url)
+        response.raise_for_status()
+        account_ids = [rev_data["accountId"] for rev_data in response.json()["results"]]
+        names = self.profile_cache and self.profile_cache.get(
+            'reviewer_names', max_age=self.reviewer_names_max_age
+        ) or {}
+        if any(account_id not in names for account_id in account_ids):
+            names = self.get_user_names(account_ids)
+            if self.profile_cache:
+                self.profile_cache.set('reviewer_names', names)
         res = {}
-        for index, rev_data in enumerate(response.json()["results"]):
-            resp = self.jira_session.get(rev_data["self"])
-            res[f"{index + 1}"] = {"name": resp.json()["displayName"], "accountId": rev_data["accountId"]}
+        for index, account_id in enumerate(account_ids):
+            res[f"{index + 1}"] = {"name": names.get(account_id, account_id), "accountId": account_id}
         return res
 
     def get_timesheet_state(self, date_window):
@@ -1,26 +1,31 @@
-from collections import namedtuple
-
-
 class MultiLog:
 
-    def __init__(self, _id, issue, duration, date, comment):
+    def __init__(self, _id, issue, duration, date, comment, worklog_id=None,
+                 updated_at=None):
         self.id = int(_id) if _id else None
         self.issue = issue
         self.duration = duration
         self.date = date
         self.comment = comment
+        # Tempo worklog id, only set for logs fetched from Tempo
+        self.worklog_id = worklog_id
+        # Tempo `updatedAt`, only set for logs fetched from Tempo
+        self.updated_at = updated_at
 
     __slots__ = (
-        "id", "issue", "duration", "date", "comment"
+        "id", "issue", "duration", "date", "comment", "worklog_id",
+        "updated_at",
     )
 
-    def _asdict(self):
-        return {k: getattr(self, k) for k in ("issue", "duration", "date", "comment")}
+    @property
+    def sync_key(self):
+        """Hashable key identifying this log when reconciling"""
+        return (self.issue, self.duration, self.date, self.comment)
 
     def __eq__(self, other):
-        d1 = self._asdict()
-        d2 = other._asdict()
-        return d1 == d2
+        if not isinstance(other, MultiLog):
+            return NotImplemented
+        return self.sync_key == other.sync_key
 
     @property
     def human_duration(self):
@@ -34,6 +39,12 @@ class MultiLog:
             minutes = int(duration % 3600 / 60)
         return '{}h {:02}m'.format(hours, minutes)
 
+    @property
+    def description(self):
+        return "{} {} {}: {}".format(
+            self.issue, self.date, self.human_duration, self.comment
+        )
+
     @property
     def jira_ref(self):
         # When loaded from gtimelog we don't have the ID
@@ -1,16 +1,28 @@
 import odoorpc
 
-from datetime import timedelta
+from collections import defaultdict, deque, namedtuple
+from datetime import datetime, timedelta
 from urllib.parse import urlparse
 
+from .profile_cache import ProfileCache
+
+ODOO_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+AttendanceDiff = namedtuple(
+    'AttendanceDiff', 'to_create to_write to_unlink unchanged'
+)
+
 
 class OdooClient(object):
-    def __init__(self, config):
+    def __init__(self, config, profiler=None):
         self.client = odoorpc.ODOO(
             host=urlparse(config.get("odoo_url", "")).netloc,
             protocol=config.get("odoo_protocol"),
             port=config.get("odoo_port"),
+            timeout=float(config.get("http_timeout", 120)),
         )
+        if profiler:
+            profiler.instrument_odoo(self.client)
         self.client.login(
             db=config.get("odoo_db"),
             login=config.get("odoo_user"),
@@ -18,53 +30,167 @@ class OdooClient(object):
         )
         self.tz_offset = config.get("tz_offset")
         self._attendance_default = None
+        self.profile_cache = None
+        if not config.get("no_profile_cache"):
+            self.profile_cache = ProfileCache(
+                "{}/{}".format(config.get("odoo_url"), config.get("odoo_db")),
+                config.get("odoo_user"),
+            )
         self._uid = self._get_uid()
 
     def _get_uid(self):
         return self.client.env.uid
 
     def _attendance_defaults(self):
+        if self._attendance_default is None and self.profile_cache:
+            self._attendance_default = self.profile_cache.get("attendance_defaults")
         if self._attendance_default is None:
             self._attendance_default = self.client.env["hr.attendance"].default_get(["employee_id"])
+            if self.profile_cache:
+                self.profile_cache.set("attendance_defaults", self._attendance_default)
         return self._attendance_default
 
-    def drop_attendances(self, date_window):
-        employee_id = self._attendance_defaults()["employee_id"]
-        attendance_ids = self.client.env["hr.attendance"].search(
-            [
-                ("employee_id", "=", employee_id),
-                ("check_in", ">=", date_window.start.isoformat()),
-                "|",
-                ("check_out", "<=", date_window.stop.isoformat()),
-                ("check_out", "=", None)
-            ]
+    def _to_utc(self, dt):
+        """Format a local datetime as an Odoo UTC datetime"""
+        if not dt:
+            return False
+        delta = timedelta(seconds=self.tz_offset)
+        return (dt - delta).strftime(ODOO_DATETIME_FORMAT)
+
+    def _from_utc(self, value):
+        """Parse an Odoo UTC datetime to a local datetime"""
+        if not value:
+            return None
+        delta = timedelta(seconds=self.tz_offset)
+        return datetime.strptime(value, ODOO_DATETIME_FORMAT) + delta
+
+    def _attendance_domain(self, date_window):
+        start = self._to_utc(date_window.start)
+        stop = self._to_utc(date_window.stop)
+        return [
+            ("employee_id", "=", self._attendance_defaults()["employee_id"]),
+            ("check_in", ">=", start),
+            ("check_in", "<=", stop),
+            "|",
+            ("check_out", "<=", stop),
+            ("check_out", "=", None)
+        ]
+
+    def get_attendances(self, date_window):
+        return self.client.env["hr.attendance"].search_read(
+            self._attendance_domain(date_window), ["check_in", "check_out"]
         )
-        # TODO: we should avoid deletion of all records when not required.
-        # If they have not changed, it's pointless to do it.
-        error_removing_all = False
-        if attendance_ids:
+
+    def diff_attendances(self, date_window, attendances):
+        """Compare gtimelog attendances with the ones recorded in Odoo
+
+        Records matching exactly are left untouched, records with the same
+        check in only get their check out written, remaining records are
+        unlinked and missing attendances created.
+        """
+        existing_by_key = defaultdict(deque)
+        for record in self.get_attendances(date_window):
+            existing_by_key[(record["check_in"], record["check_out"])].append(
+                record["id"]
+            )
+
+        unchanged = []
+        missing = []
+        for check_in, check_out in attendances:
+            key = (self._to_utc(check_in), self._to_utc(check_out))
+            if existing_by_key.get(key):
+                unchanged.append(existing_by_key[key].popleft())
+            else:
+                missing.append(key)
+
+        leftover_by_check_in = defaultdict(deque)
+        for (check_in, _check_out), ids in existing_by_key.items():
+            leftover_by_check_in[check_in].extend(ids)
+
+        to_create = []
+        to_write = []
+        for check_in, check_out in missing:
+            if leftover_by_check_in.get(check_in):
+                to_write.append((
+                    leftover_by_check_in[check_in].popleft(),
+                    {"check_out": check_out},
+                ))
+            else:
+                to_create.append({
+                    "employee_id": self._attendance_defaults()["employee_id"],
+                    "check_in": check_in,
+                    "check_out": check_out,
+                })
+        to_unlink = [
+            attendance_id
+            for ids in leftover_by_check_in.values()
+            for attendance_id in ids
+        ]
+        return AttendanceDiff(to_create, to_write, to_unlink, unchanged)
+
+    def apply_attendance_diff(self, diff):
+        """Apply `diff`, return the number of changes refused by Odoo"""
+        model = self.client.env["hr.attendance"]
+        failures = 0
+        if diff.to_unlink:
+            failures += len(self._unlink_attendances(diff.to_unlink))
+        for attendance_id, values in diff.to_write:
             try:
-                self.client.env["hr.attendance"].unlink(attendance_ids)
+                model.write([attendance_id], values)
             except odoorpc.error.RPCError:
-                error_removing_all = True
-        if error_removing_all:
-            for attendance_id in attendance_ids:
-                try:
-                    self.client.env["hr.attendance"].unlink(attendance_id)
-                except odoorpc.error.RPCError:
-                    pass
-            print("Some Odoo attendances could not be updated, invoicing period probably closed !")
-
-    def create_attendance(self, check_in, check_out):
-        delta = timedelta(seconds=self.tz_offset)
-        values = {
-            "employee_id": self._attendance_defaults()["employee_id"],
-            "check_in": (check_in - delta).strftime("%Y-%m-%d %H:%M:%S"),
-            "check_out": (check_out and (check_out - delta).strftime("%Y-%m-%d %H:%M:%S"))
-        }
+                failures += 1
+                print("Error updating attendance {} to {}".format(
+                    attendance_id, values["check_out"])
+                )
+        if diff.to_create:
+            try:
+                model.create(diff.to_create)
+            except odoorpc.error.RPCError:
+                # one of them is refused (or Odoo can't create in batch)
+                for values in diff.to_create:
+                    if not self._create_attendance_values(values):
+                        failures += 1
+        return failures
+
+    def _unlink_bisect(self, attendance_ids):
+        """Unlink attendances, isolating the ones Odoo refuses to remove
+
+        On failure the ids are split in halves which are retried, so only
+        O(k.log n) calls are needed for k locked records out of n.
+        Return the ids which could not be removed.
+        """
+        try:
+            self.client.env["hr.attendance"].unlink(attendance_ids)
+            return []
+        except odoorpc.error.RPCError:
+            if len(attendance_ids) == 1:
+                return attendance_ids
+        middle = len(attendance_ids) // 2
+        return (self._unlink_bisect(attendance_ids[:middle])
+                + self._unlink_bisect(attendance_ids[middle:]))
+
+    def _unlink_attendances(self, attendance_ids):
+        failed = self._unlink_bisect(list(attendance_ids))
+        if failed:
+            records = self.client.env["hr.attendance"].read(
+                failed, ["check_in", "check_out"]
+            )
+            print("Some Odoo attendances could not be removed, "
+                  "invoicing period probably closed !")
+            for record in sorted(records, key=lambda r: r["check_in"]):
+                print("  [{}] {} → {}".format(
+                    record["id"],
+                    self._from_utc(record["check_in"]),
+                    self._from_utc(record["check_out"]),
+                ))
+        return failed
+
+    def _create_attendance_values(self, values):
         try:
             self.client.env["hr.attendance"].create(values)
         except odoorpc.error.RPCError:
             print("Error updating attendance for {} to {}".format(
                 values["check_in"], values["check_out"])
             )
+            return False
+        return True
@@ -0,0 +1,48 @@
+import hashlib
+import json
+import time
+
+from .cache import cache_path
+
+
+class ProfileCache(object):
+    """Values stable for a given account, kept between runs
+
+    Stored as JSON in the cache directory, in a file named after a hash of
+    the server URL and the user so it is never used for other credentials.
+    Values older than `max_age` are ignored.
+    """
+
+    max_age = 7 * 24 * 3600
+
+    def __init__(self, url, user):
+        digest = hashlib.sha256(
+            '{}\0{}'.format(url, user).encode('utf-8')
+        ).hexdigest()
+        self.path = cache_path('profiles', digest + '.json')
+        try:
+            with open(self.path) as f:
+                self._values = json.load(f)
+        except (OSError, ValueError):
+            self._values = {}
+
+    def _save(self):
+        try:
+            with open(self.path, 'w') as f:
+                json.dump(self._values, f)
+        except OSError:
+            pass
+
+    def get(self, key, max_age=None):
+        value, updated = self._values.get(key, (None, 0))
+        if time.time() - updated > (max_age or self.max_age):
+            return None
+        return value
+
+    def set(self, key, value):
+        self._values[key] = (value, time.time())
+        self._save()
+
+    def clear(self):
+        self._values = {}
+        self._save()
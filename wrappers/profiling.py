@@ -0,0 +1,132 @@
+import json
+import re
+import threading
+import time
+
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# path segments replaced to group calls per endpoint
+PATH_PLACEHOLDERS = [
+    (re.compile(r'/worklogs/\d+$'), '/worklogs/{id}'),
+    (re.compile(r'/issue/[^/]+'), '/issue/{ref}'),
+    (re.compile(r'/user/(?!bulk$)[^/]+'), '/user/{accountId}'),
+]
+
+
+class Profiler(object):
+    """Time the phases of a sync and the calls made to each endpoint
+
+    Sessions and Odoo clients are instrumented with `instrument_session`
+    and `instrument_odoo`. It is thread safe.
+    """
+
+    def __init__(self):
+        self.phases = []
+        # endpoint -> [count, bytes, seconds, max seconds]
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases.append((name, time.perf_counter() - start))
+
+    def record(self, endpoint, size, seconds):
+        with self._lock:
+            stats = self.calls.setdefault(endpoint, [0, 0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += size
+            stats[2] += seconds
+            stats[3] = max(stats[3], seconds)
+
+    @staticmethod
+    def endpoint(method, url):
+        url = urlparse(url)
+        path = url.path
+        for pattern, placeholder in PATH_PLACEHOLDERS:
+            path = pattern.sub(placeholder, path)
+        return '{} {}{}'.format(method, url.netloc, path)
+
+    def instrument_session(self, session):
+        """Record every response of a `requests.Session`"""
+        def record_response(response, *args, **kwargs):
+            self.record(
+                self.endpoint(response.request.method, response.url),
+                len(response.content),
+                response.elapsed.total_seconds(),
+            )
+        session.hooks['response'].append(record_response)
+        return session
+
+    def instrument_odoo(self, client):
+        """Record every JSON-RPC call of an `odoorpc.ODOO` client"""
+        call_json = client.json
+
+        def timed_json(url, params):
+            start = time.perf_counter()
+            try:
+                return call_json(url, params)
+            finally:
+                endpoint = 'RPC {}'.format(url)
+                if params.get('method') == 'execute_kw':
+                    endpoint = 'RPC {}.{}'.format(*params['args'][3:5])
+                elif params.get('service'):
+                    endpoint = 'RPC {}.{}'.format(params['service'],
+                                                  params.get('method'))
+                self.record(endpoint, 0, time.perf_counter() - start)
+
+        client.json = timed_json
+        return client
+
+    def as_dict(self):
+        with self._lock:
+            # phases run several times are summed up
+            phases = {}
+            for name, seconds in self.phases:
+                phases[name] = phases.get(name, 0) + seconds
+            return {
+                'total_seconds': time.perf_counter() - self._start,
+                'phases': [
+                    {'name': name, 'seconds': seconds}
+                    for name, seconds in phases.items()
+                ],
+                'calls': [
+                    {
+                        'endpoint': endpoint,
+                        'count': count,
+                        'bytes': size,
+                        'seconds': seconds,
+                        'max_seconds': max_seconds,
+                    }
+                    for endpoint, (count, size, seconds, max_seconds)
+                    in sorted(self.calls.items(), key=lambda c: -c[1][2])
+                ],
+            }
+
+    def report(self, path=None):
+        """Print the profile, or dump it as JSON to `path`"""
+        profile = self.as_dict()
+        if path:
+            with open(path, 'w') as f:
+                json.dump(profile, f, indent=2)
+            return
+        print()
+        print("Profile")
+        print("=======")
+        for phase in profile['phases']:
+            print("  {:<24} {:>8.3f}s".format(phase['name'], phase['seconds']))
+        print("  {:<24} {:>8.3f}s".format('total', profile['total_seconds']))
+        if profile['calls']:
+            print()
+            print("  {:<64} {:>5} {:>9} {:>8} {:>7}".format(
+                'endpoint', 'calls', 'bytes', 'time', 'max'))
+            for call in profile['calls']:
+                print("  {:<64} {:>5} {:>9} {:>7.3f}s {:>6.3f}s".format(
+                    call['endpoint'][:64], call['count'], call['bytes'],
+                    call['seconds'], call['max_seconds']))
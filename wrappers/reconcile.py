@@ -0,0 +1,61 @@
+from collections import defaultdict, deque, namedtuple
+
+Reconciliation = namedtuple(
+    'Reconciliation', 'to_create to_update to_delete unchanged'
+)
+
+
+def reconcile(remote_logs, local_logs):
+    """Diff Tempo worklogs against gtimelog entries
+
+    Logs are matched on their `sync_key` and counted as multisets: two
+    identical gtimelog entries need two Tempo worklogs to be in sync.
+    Runs in linear time, the original order of the logs is kept.
+
+    Remaining Tempo worklogs and gtimelog entries on the same issue and
+    date are paired in `to_update` as `(remote, local)` tuples, so the
+    worklog can be updated in place instead of deleted and recreated.
+    """
+    remote_logs = list(remote_logs)
+    remote_by_key = defaultdict(deque)
+    for log in remote_logs:
+        remote_by_key[log.sync_key].append(log)
+
+    to_create = []
+    unchanged = []
+    for log in local_logs:
+        matches = remote_by_key.get(log.sync_key)
+        if matches:
+            unchanged.append(matches.popleft())
+        else:
+            to_create.append(log)
+
+    matched = {id(log) for log in unchanged}
+    to_delete = [log for log in remote_logs if id(log) not in matched]
+    to_create, to_update, to_delete = pair_updates(to_create, to_delete)
+    return Reconciliation(to_create, to_update, to_delete, unchanged)
+
+
+def pair_updates(to_create, to_delete):
+    """Pair logs to create with logs to delete on the same issue and date
+
+    Return the remaining `to_create`, the `(remote, local)` pairs and the
+    remaining `to_delete`.
+    """
+    deletable = defaultdict(deque)
+    for log in to_delete:
+        if log.worklog_id:
+            deletable[(log.issue, log.date)].append(log)
+
+    remaining_create = []
+    to_update = []
+    for log in to_create:
+        candidates = deletable.get((log.issue, log.date))
+        if candidates:
+            to_update.append((candidates.popleft(), log))
+        else:
+            remaining_create.append(log)
+
+    updated = {id(remote) for remote, _local in to_update}
+    remaining_delete = [log for log in to_delete if id(log) not in updated]
+    return remaining_create, to_update, remaining_delete
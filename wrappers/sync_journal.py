@@ -0,0 +1,61 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from collections import namedtuple
+
+from .cache import cache_path
+
+JournalEntry = namedtuple('JournalEntry', 'local remote synced_at')
+
+
+class SyncJournal(object):
+    """State of the weeks at their last successful synchronization
+
+    For each week, a fingerprint of the gtimelog entries and attendances
+    pushed, and one of the Tempo worklogs once in sync (ids and update
+    dates), are kept per Tempo instance and user. A week for which both
+    are unchanged does not need to be compared again.
+    """
+
+    def __init__(self, profile, path=None):
+        self.profile = profile
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(
+            str(path or cache_path('state.sqlite')),
+            timeout=30,
+            check_same_thread=False,
+        )
+        with self.db:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS weeks (
+                    profile TEXT, week TEXT, local TEXT, remote TEXT,
+                    synced_at REAL,
+                    PRIMARY KEY (profile, week)
+                )
+            """)
+
+    @staticmethod
+    def fingerprint(*values):
+        return hashlib.sha256(
+            json.dumps(values, default=str).encode('utf-8')
+        ).hexdigest()
+
+    def get(self, week):
+        """Return the `JournalEntry` of `week` or None"""
+        with self._lock:
+            row = self.db.execute(
+                "SELECT local, remote, synced_at FROM weeks "
+                "WHERE profile = ? AND week = ?",
+                (self.profile, week)
+            ).fetchone()
+        return row and JournalEntry(*row)
+
+    def record(self, week, local, remote):
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO weeks VALUES (?, ?, ?, ?, ?)",
+                (self.profile, week, local, remote, time.time())
+            )
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import threading
+
+from datetime import date, datetime
+
+from .cache import cache_path
+from .multi_log import MultiLog
+
+
+def _log_values(log):
+    return {
+        'id': log.id,
+        'issue': log.issue,
+        'duration': log.duration,
+        'date': log.date.isoformat(),
+        'comment': log.comment,
+        'worklog_id': log.worklog_id,
+    }
+
+
+def _log(values):
+    return MultiLog(values['id'], values['issue'], values['duration'],
+                    date.fromisoformat(values['date']), values['comment'],
+                    worklog_id=values['worklog_id'])
+
+
+def _datetime(value):
+    return value and datetime.fromisoformat(value)
+
+
+class SyncPlan(object):
+    """Writes of a synchronization, saved before any of them is made
+
+    The plan is a JSON file. Each write is checkpointed as soon as it
+    succeeded by appending a line to the `.done` file next to it, so an
+    interrupted synchronization can be resumed with the pending writes
+    only.
+
+    Worklogs operations are `(kind, log, old log)` tuples. Attendances are
+    stored as the expected set for the date window, their diff is
+    computed when the plan is applied. `known_worklogs` are the ids of the
+    Tempo worklogs the plan was computed from: worklogs created since then
+    tell which creates were made but not checkpointed.
+    """
+
+    version = 1
+
+    def __init__(self, path, profile, date_window, worklogs=(),
+                 attendances=None, known_worklogs=(), repair=()):
+        self.path = str(path)
+        self.done_path = self.path + '.done'
+        self.profile = profile
+        self.date_window = date_window
+        self.worklogs = list(worklogs)
+        self.attendances = attendances
+        self.known_worklogs = set(known_worklogs)
+        self.repair = list(repair)
+        # checkpointed operation -> Tempo worklog id created, if any
+        self.done = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def default_path(profile):
+        """Path of the plan of the synchronizations of `profile`"""
+        digest = hashlib.sha256(profile.encode('utf-8')).hexdigest()
+        return cache_path('plans', digest[:16] + '.json')
+
+    @classmethod
+    def load(cls, path):
+        """Load a plan and its checkpoints"""
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != cls.version:
+            raise Exception("Unsupported plan file %s." % path)
+        attendances = data['attendances']
+        plan = cls(
+            path,
+            data['profile'],
+            tuple(map(_datetime, data['date_window'])),
+            worklogs=[
+                (kind, _log(log), old and _log(old))
+                for kind, log, old in data['worklogs']
+            ],
+            attendances=None if attendances is None else [
+                (_datetime(check_in), _datetime(check_out))
+                for check_in, check_out in attendances
+            ],
+            known_worklogs=data['known_worklogs'],
+            repair=data['repair'],
+        )
+        try:
+            with open(plan.done_path) as f:
+                for line in f:
+                    try:
+                        operation, worklog_id = json.loads(line)
+                    except ValueError:
+                        # interrupted while checkpointing
+                        continue
+                    plan.done[operation] = worklog_id
+        except FileNotFoundError:
+            pass
+        return plan
+
+    def save(self):
+        """Write the plan (atomically) and clear its checkpoints"""
+        data = {
+            'version': self.version,
+            'profile': self.profile,
+            'date_window': [day.isoformat() for day in self.date_window],
+            'worklogs': [
+                (kind, _log_values(log), old and _log_values(old))
+                for kind, log, old in self.worklogs
+            ],
+            'attendances': None if self.attendances is None else [
+                (check_in.isoformat(), check_out and check_out.isoformat())
+                for check_in, check_out in self.attendances
+            ],
+            'known_worklogs': sorted(self.known_worklogs),
+            'repair': self.repair,
+        }
+        # checkpoints of a previous plan must not apply to this one
+        with open(self.done_path, 'w'):
+            pass
+        self.done = {}
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.path + '.tmp', self.path)
+
+    def checkpoint(self, operation, worklog_id=None):
+        """Record that `operation` is done, safe to call from threads"""
+        with self._lock:
+            with open(self.done_path, 'a') as f:
+                f.write(json.dumps([operation, worklog_id]) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.done[operation] = worklog_id
+
+    def pending_worklogs(self):
+        """Return the `(operation, (kind, log, old log))` not done yet"""
+        return [
+            ('worklog:%d' % index, worklog)
+            for index, worklog in enumerate(self.worklogs)
+            if 'worklog:%d' % index not in self.done
+        ]
+
+    def is_done(self):
+        return (not self.pending_worklogs()
+                and (self.attendances is None or 'attendances' in self.done)
+                and (not self.repair or 'repair' in self.done))
+
+    def remove(self):
+        for path in (self.path, self.done_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,140 @@
+import bisect
+import hashlib
+import json
+import os
+import re
+
+from datetime import date, timedelta
+
+DAY_RE = re.compile(rb'^(\d{4}-\d\d-\d\d) ')
+
+
+class TimelogIndex(object):
+    """Byte offset of the first line of each day of a gtimelog timelog
+
+    The index is stored next to the timelog (`timelog.txt.idx`). It is
+    trusted while the timelog size and mtime did not change, and extended
+    by scanning only the new lines when the previously indexed content is
+    untouched (checked with a checksum of its tail). Otherwise it is
+    rebuilt from scratch.
+    """
+
+    version = 1
+    tail_size = 4096
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.index_filename = filename + '.idx'
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.size = 0
+        self.mtime_ns = None
+        self.tail = None
+        self.sorted = True
+        self.days = {}
+        # offset from which the last update scanned the timelog
+        self.scanned_from = 0
+
+    def _load(self):
+        try:
+            with open(self.index_filename) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != self.version:
+            return
+        self.size = data['size']
+        self.mtime_ns = data['mtime_ns']
+        self.tail = data['tail']
+        self.sorted = data['sorted']
+        self.days = data['days']
+
+    def _save(self):
+        data = {
+            'version': self.version,
+            'size': self.size,
+            'mtime_ns': self.mtime_ns,
+            'tail': self.tail,
+            'sorted': self.sorted,
+            'days': self.days,
+        }
+        try:
+            with open(self.index_filename, 'w') as f:
+                json.dump(data, f)
+        except OSError:
+            # read-only location, the index only lives for this run
+            pass
+
+    def _tail_checksum(self, f, size):
+        start = max(size - self.tail_size, 0)
+        f.seek(start)
+        return hashlib.sha1(f.read(size - start)).hexdigest()
+
+    def _scan(self, f, offset):
+        f.seek(offset)
+        last_day = max(self.days) if self.days else ''
+        for line in f:
+            if not line.endswith(b'\n'):
+                # being written, index it once complete
+                break
+            match = DAY_RE.match(line)
+            if match:
+                day = match.group(1).decode()
+                if day < last_day:
+                    self.sorted = False
+                if day not in self.days:
+                    self.days[day] = offset
+                last_day = max(day, last_day)
+            offset += len(line)
+        self.size = offset
+
+    def update(self):
+        """Bring the index up to date with the timelog
+
+        Return True when the timelog changed since the last update.
+        """
+        stat = os.stat(self.filename)
+        if stat.st_mtime_ns == self.mtime_ns and stat.st_size == self.size:
+            return False
+        with open(self.filename, 'rb') as f:
+            # same size but new mtime: edited in place
+            if stat.st_size <= self.size \
+                    or self._tail_checksum(f, self.size) != self.tail:
+                self._reset()
+            self.scanned_from = self.size
+            self._scan(f, self.size)
+            self.tail = self._tail_checksum(f, self.size)
+        self.mtime_ns = stat.st_mtime_ns
+        self._save()
+        return True
+
+    def day_at(self, offset):
+        """Day of the line at `offset`, only valid if the timelog is `sorted`"""
+        days = [day for day, day_offset in self.days.items()
+                if day_offset <= offset]
+        return date.fromisoformat(max(days)) if days else None
+
+    def offset_for(self, day):
+        """Offset of the first line of `day` or of the next indexed day"""
+        days = sorted(self.days)
+        position = bisect.bisect_left(days, day.isoformat())
+        if position == len(days):
+            return None
+        return self.days[days[position]]
+
+    def read_lines(self, first_day, last_day):
+        """Iterate over the lines logged from first_day to last_day
+
+        Only valid if the timelog is `sorted`.
+        """
+        start = self.offset_for(first_day)
+        if start is None:
+            return
+        stop = self.offset_for(last_day + timedelta(days=1))
+        with open(self.filename, 'rb') as f:
+            f.seek(start)
+            data = f.read(stop - start if stop is not None else -1)
+        for line in data.decode('utf-8').splitlines():
+            yield line
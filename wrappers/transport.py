@@ -0,0 +1,90 @@
+import random
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InvalidHeader
+from urllib3.util.retry import Retry
+
+# seconds to connect and to wait for an answer, as `requests` expects them
+DEFAULT_TIMEOUT = (10, 60)
+# answers asking to come back later, usually with a Retry-After header
+RATE_LIMIT_STATUSES = (429, 503)
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+
+class JitteredRetry(Retry):
+    """Retry whose exponential backoff is drawn between half and all of
+    its value, so concurrent clients do not retry in step
+
+    Rate limited reads wait for Retry-After, rate limited writes are not
+    retried: `WriteExecutor` holds all the writes off instead.
+    """
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(backoff / 2, backoff) if backoff else 0
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if status_code in RATE_LIMIT_STATUSES \
+                and method.upper() not in READ_METHODS:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def parse_retry_after(self, retry_after):
+        try:
+            return super().parse_retry_after(retry_after)
+        except InvalidHeader:
+            # use the backoff instead
+            return None
+
+
+class TimeoutSession(requests.Session):
+    """`requests.Session` applying `timeout` to requests without one"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def new_adapter(pool_maxsize=10, retries=3, backoff=0.5):
+    """Connection pools of `pool_maxsize` connections per host
+
+    Connection errors are retried for any request, as nothing was sent.
+    Read errors and 500/502/504 answers are only retried for idempotent
+    methods: creating a worklog twice is worse than reporting an error.
+    Rate limits (429/503) are only retried for reads, see `JitteredRetry`.
+    """
+    retry = JitteredRetry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        status_forcelist=(500, 502, 504) + RATE_LIMIT_STATUSES,
+        backoff_factor=backoff,
+        raise_on_status=False,
+    )
+    return HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=retry)
+
+
+def new_session(adapter=None, timeout=DEFAULT_TIMEOUT):
+    """Session using `adapter` (a new one by default) for every URL,
+    with a default timeout"""
+    session = TimeoutSession(timeout)
+    adapter = adapter or new_adapter()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def timeout_from_config(config):
+    """`(connect, read)` timeout from `http_timeout` (read) and
+    `http_connect_timeout` options"""
+    return (
+        float(config.get('http_connect_timeout', DEFAULT_TIMEOUT[0])),
+        float(config.get('http_timeout', DEFAULT_TIMEOUT[1])),
+    )
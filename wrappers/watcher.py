@@ -0,0 +1,64 @@
+import os
+import time
+
+
+class TimelogWatcher(object):
+    """Wait for changes of the timelog
+
+    On Linux, changes are notified through inotify when the optional
+    `inotify_simple` package is installed, the file is polled every
+    `interval` seconds otherwise. The directory is watched, as editors
+    replace files instead of writing them in place.
+    """
+
+    def __init__(self, filename, debounce=5.0, interval=5.0):
+        self.filename = os.path.abspath(filename)
+        self.debounce = debounce
+        self.interval = interval
+        self._stat = self._get_stat()
+        self.inotify = None
+        try:
+            from inotify_simple import INotify, flags
+        except ImportError:
+            return
+        self.inotify = INotify()
+        self.inotify.add_watch(
+            os.path.dirname(self.filename),
+            flags.MODIFY | flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE,
+        )
+
+    def _get_stat(self):
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _changed(self, timeout=None):
+        """Wait up to `timeout` seconds (forever if None) for a change"""
+        if self.inotify:
+            events = self.inotify.read(
+                timeout=None if timeout is None else int(timeout * 1000)
+            )
+            name = os.path.basename(self.filename)
+            return any(event.name == name for event in events)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+                if delay <= 0:
+                    return False
+            time.sleep(delay)
+            stat = self._get_stat()
+            if stat != self._stat:
+                self._stat = stat
+                return True
+
+    def wait(self):
+        """Block until the timelog changed and did not change anymore for
+        `debounce` seconds"""
+        while not self._changed():
+            pass
+        while self._changed(self.debounce):
+            pass
@@ -0,0 +1,134 @@
+import random
+import threading
+import time
+
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+from requests import RequestException
+
+WriteResult = namedtuple(
+    'WriteResult', 'kind description ok status error response'
+)
+
+
+class WriteExecutor(object):
+    """Run write requests concurrently on a bounded thread pool
+
+    Each operation is a callable returning a `requests.Response`.
+    Answers with a status in `retry_statuses` are retried with a jittered
+    exponential backoff, honouring `Retry-After`. As rate limits apply to
+    the API token, the whole pool holds off until the delay is over.
+    Deleting a worklog which is already gone succeeds.
+
+    Network errors fail their operation only. Any other error, such as
+    rejected credentials, cancels the operations not started yet and is
+    raised by `run`.
+    """
+
+    retry_statuses = (429, 503)
+    gone_statuses = (404,)
+
+    def __init__(self, max_workers=4, max_retries=5, backoff=1.0):
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._operations = []
+        self._lock = threading.Lock()
+        self._resume_at = 0
+        self._cancelled = threading.Event()
+
+    def add(self, kind, description, func, *args):
+        self._operations.append((kind, description, func, args))
+
+    def _hold_off(self, delay):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+    def _wait(self):
+        with self._lock:
+            delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _retry_delay(self, response, attempt):
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return max(float(retry_after), 0)
+            except ValueError:
+                pass
+            try:
+                return max(
+                    parsedate_to_datetime(retry_after).timestamp()
+                    - time.time(), 0
+                )
+            except (TypeError, ValueError):
+                pass
+        return self.backoff * 2 ** attempt * random.uniform(0.5, 1)
+
+    def _run(self, kind, description, func, args):
+        for attempt in range(self.max_retries + 1):
+            self._wait()
+            if self._cancelled.is_set():
+                return WriteResult(kind, description, False, None,
+                                   'cancelled', None)
+            try:
+                response = func(*args)
+            except RequestException as e:
+                return WriteResult(kind, description, False, None, str(e),
+                                   None)
+            except Exception:
+                self._cancelled.set()
+                raise
+            if response.status_code in self.retry_statuses \
+                    and attempt < self.max_retries:
+                self._hold_off(self._retry_delay(response, attempt))
+                continue
+            ok = response.ok or (kind == 'delete' and
+                                 response.status_code in self.gone_statuses)
+            error = None if ok else response.text
+            return WriteResult(kind, description, ok,
+                               response.status_code, error, response)
+
+    def run(self, on_result=None):
+        """Run all pending operations and return their `WriteResult`
+
+        `on_result(index, result)` is called from the worker threads as
+        soon as an operation, the index-th added, is over.
+        """
+        operations, self._operations = self._operations, []
+        if not operations:
+            return []
+        self._cancelled.clear()
+
+        def run_operation(index):
+            result = self._run(*operations[index])
+            if on_result:
+                on_result(index, result)
+            return result
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(run_operation, range(len(operations))))
+
+    @staticmethod
+    def report(results):
+        if not results:
+            return
+        done = Counter(result.kind for result in results if result.ok)
+        failed = [result for result in results if not result.ok]
+        print()
+        print("Tempo writes")
+        print("============")
+        for kind in dict.fromkeys(result.kind for result in results):
+            print("  {}: {} done, {} failed".format(
+                kind, done[kind],
+                len([r for r in failed if r.kind == kind])
+            ))
+        if failed:
+            print()
+            print("Failed")
+            for result in failed:
+                print("  ", result.kind, result.description, "-",
+                      result.status or "", result.error)